@@ -4,10 +4,21 @@ Platform Client Module
 This module handles communication with the platform API for AI capabilities resolution.
 """
 
+import copy
+import json
+import threading
+import time
+
 import httpx
 from typing import Any, Dict, List, Optional
 from app.config import settings
 
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 
 class PlatformResolveError(Exception):
     """Platform resolve API 调用失败"""
@@ -21,19 +32,64 @@ class PlatformClient:
     Responsibilities:
     - Call platform resolve API to get execution plan
     - Handle errors gracefully (don't crash the main flow)
+    
+    内部复用一个 httpx.Client（连接池），多次 resolve 不必重复建立 TCP/TLS 连接；
+    安装了 h2 时启用 HTTP/2，批量 resolve 在同一连接上多路复用。
+    resolve 成功的结果按 (templateCode, versionSemver, prefer, hintParams) 在内存中缓存
+    ttl_seconds 秒，同一模板重复处理时不再重复请求 platform。
+    使用完毕后调用 close()，或以上下文管理器方式使用：
+    
+        with PlatformClient() as client:
+            client.resolve(...)
     """
     
-    def __init__(self, base_url: Optional[str] = None, timeout_ms: Optional[int] = None):
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout_ms: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
         """
         Initialize the PlatformClient.
         
         Args:
             base_url: Platform base URL (defaults to settings.PLATFORM_BASE_URL)
             timeout_ms: Request timeout in milliseconds (defaults to settings.PLATFORM_TIMEOUT_MS)
+            ttl_seconds: resolve 结果缓存时间（秒），0 表示不缓存
+                (defaults to settings.PLATFORM_RESOLVE_CACHE_TTL_S)
         """
         self.base_url = (base_url or settings.PLATFORM_BASE_URL).rstrip("/")
         self.timeout_ms = timeout_ms or settings.PLATFORM_TIMEOUT_MS
         self.timeout_seconds = self.timeout_ms / 1000.0
+        # 连接阶段快速失败（最多 2 秒），读写使用完整超时预算，连接池等待最多 1 秒
+        self._client = httpx.Client(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(
+                connect=min(2.0, self.timeout_seconds),
+                read=self.timeout_seconds,
+                write=self.timeout_seconds,
+                pool=1.0,
+            ),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        
+        # resolve 结果缓存：{cache_key: (expires_at, execution_plan)}
+        self.ttl_seconds = (
+            settings.PLATFORM_RESOLVE_CACHE_TTL_S if ttl_seconds is None else ttl_seconds
+        )
+        self._cache: Dict[tuple, tuple[float, Dict[str, Any]]] = {}
+        self._cache_lock = threading.Lock()
+    
+    def close(self) -> None:
+        """关闭底层 httpx.Client，释放连接池"""
+        self._client.close()
+    
+    def __enter__(self) -> "PlatformClient":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     def resolve(
         self,
@@ -62,7 +118,21 @@ class PlatformClient:
         Raises:
             PlatformResolveError: 如果 API 调用失败
         """
-        url = f"{self.base_url}/api/v1/ai/resolve"
+        hint_params = hint_params or {"output": "rgba"}
+        try:
+            cache_key = (
+                template_code,
+                version_semver,
+                tuple(prefer),
+                timeout_ms,
+                json.dumps(hint_params, sort_keys=True),
+            )
+        except TypeError as e:
+            raise PlatformResolveError(f"Invalid hint_params for platform resolve: {e}") from e
+        
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
         
         # 构建请求体
         request_body = {
@@ -73,55 +143,94 @@ class PlatformClient:
             "constraints": {
                 "timeoutMs": timeout_ms,
             },
-            "hintParams": hint_params or {"output": "rgba"},
+            "hintParams": hint_params,
         }
         
+        execution_plan = self._request_execution_plan(request_body, timeout_ms)
+        
+        # 只缓存解析出 provider 的结果（格式异常时的默认值不缓存）
+        if execution_plan.get("providerCode", "unknown") != "unknown":
+            self._set_cached(cache_key, execution_plan)
+        
+        return execution_plan
+    
+    def _get_cached(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存结果（返回深拷贝，调用方修改嵌套的 auth/params 也不影响缓存）"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                return None
+            expires_at, execution_plan = entry
+            if time.monotonic() >= expires_at:
+                del self._cache[cache_key]
+                return None
+            return copy.deepcopy(execution_plan)
+    
+    def _set_cached(self, cache_key: tuple, execution_plan: Dict[str, Any]) -> None:
+        """写入缓存（存深拷贝，调用方之后修改 execution_plan 不影响缓存）"""
+        if self.ttl_seconds <= 0:
+            return
+        with self._cache_lock:
+            self._cache[cache_key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(execution_plan))
+    
+    def _request_execution_plan(
+        self, request_body: Dict[str, Any], timeout_ms: int
+    ) -> Dict[str, Any]:
+        """
+        发送 resolve 请求并解析 platform 返回的 execution plan。
+        
+        Raises:
+            PlatformResolveError: 如果 API 调用失败
+        """
+        url = "/api/v1/ai/resolve"
+        
         try:
-            # 使用 httpx 发送请求
-            with httpx.Client(timeout=self.timeout_seconds) as client:
-                response = client.post(url, json=request_body)
-                response.raise_for_status()
-                result = response.json()
-                
-                # 解析 platform 返回的嵌套结构
-                # 格式：{"success": true, "data": {"direct": {"providerCode": "...", "endpoint": "..."}}}
-                if isinstance(result, dict) and "data" in result:
-                    data = result["data"]
-                    # 支持 direct 模式
-                    if isinstance(data, dict) and "direct" in data:
-                        direct = data["direct"]
-                        # 提取 providerCode 和 endpoint
-                        execution_plan = {
-                            "providerCode": direct.get("providerCode", "unknown"),
-                            "endpoint": direct.get("endpoint", ""),
-                            "timeoutMs": direct.get("timeoutMs", timeout_ms),
-                        }
-                        # 如果有 auth 信息，也保留
-                        if "auth" in direct:
-                            execution_plan["auth"] = direct["auth"]
-                        # 如果有 params，也保留
-                        if "params" in direct:
-                            execution_plan["params"] = direct["params"]
-                        return execution_plan
-                    # 如果 data 直接包含 providerCode 和 endpoint（兼容其他格式）
-                    elif isinstance(data, dict) and "providerCode" in data:
-                        return {
-                            "providerCode": data.get("providerCode", "unknown"),
-                            "endpoint": data.get("endpoint", ""),
-                            "timeoutMs": data.get("timeoutMs", timeout_ms),
-                        }
-                
-                # 如果已经是扁平结构（向后兼容）
-                if isinstance(result, dict) and "providerCode" in result:
-                    return result
-                
-                # 如果格式不符合预期，打印警告并返回默认值
-                print(f"[PlatformClient] ⚠️ Unexpected response format: {result}")
-                return {
-                    "providerCode": "unknown",
-                    "endpoint": "",
-                    "timeoutMs": timeout_ms,
-                }
+            # 使用复用的 httpx.Client 发送请求
+            response = self._client.post(url, json=request_body)
+            response.raise_for_status()
+            result = response.json()
+            
+            # 解析 platform 返回的嵌套结构
+            # 格式：{"success": true, "data": {"direct": {"providerCode": "...", "endpoint": "..."}}}
+            if isinstance(result, dict) and "data" in result:
+                data = result["data"]
+                # 支持 direct 模式
+                if isinstance(data, dict) and "direct" in data:
+                    direct = data["direct"]
+                    # 提取 providerCode 和 endpoint
+                    execution_plan = {
+                        "providerCode": direct.get("providerCode", "unknown"),
+                        "endpoint": direct.get("endpoint", ""),
+                        "timeoutMs": direct.get("timeoutMs", timeout_ms),
+                    }
+                    # 如果有 auth 信息，也保留
+                    if "auth" in direct:
+                        execution_plan["auth"] = direct["auth"]
+                    # 如果有 params，也保留
+                    if "params" in direct:
+                        execution_plan["params"] = direct["params"]
+                    return execution_plan
+                # 如果 data 直接包含 providerCode 和 endpoint（兼容其他格式）
+                elif isinstance(data, dict) and "providerCode" in data:
+                    return {
+                        "providerCode": data.get("providerCode", "unknown"),
+                        "endpoint": data.get("endpoint", ""),
+                        "timeoutMs": data.get("timeoutMs", timeout_ms),
+                    }
+            
+            # 如果已经是扁平结构（向后兼容）
+            if isinstance(result, dict) and "providerCode" in result:
+                return result
+            
+            # 如果格式不符合预期，打印警告并返回默认值
+            print(f"[PlatformClient] ⚠️ Unexpected response format: {result}")
+            return {
+                "providerCode": "unknown",
+                "endpoint": "",
+                "timeoutMs": timeout_ms,
+            }
         except httpx.HTTPError as e:
             raise PlatformResolveError(f"Platform resolve API call failed: {e}") from e
         except Exception as e:
@@ -41,6 +41,17 @@ class Settings(BaseSettings):
         default=5000,
         validation_alias="PLATFORM_TIMEOUT_MS",
     )
+    # resolve 结果缓存时间（秒），0 表示不缓存
+    PLATFORM_RESOLVE_CACHE_TTL_S: float = Field(
+        default=60,
+        validation_alias="PLATFORM_RESOLVE_CACHE_TTL_S",
+    )
+    
+    # RenderEngine 素材（背景/贴纸）解码缓存上限（MB），0 表示不缓存（默认关闭）
+    RENDER_ASSET_CACHE_MB: int = Field(
+        default=0,
+        validation_alias="RENDER_ASSET_CACHE_MB",
+    )
 
 
 settings = Settings()
@@ -4,6 +4,7 @@ from threading import Semaphore
 from pathlib import Path
 
 from app.config import settings
+from app.clients.platform_client import PlatformClient
 from app.utils.logging import log_event
 
 from app.routers.health import router as health_router
@@ -84,6 +85,8 @@ app.mount("/files", StaticFiles(directory=settings.PIPELINE_DATA_DIR), name="fil
 
 @app.on_event("startup")
 def on_startup():
+    # 进程内共享的 PlatformClient：跨请求复用连接池和 resolve 结果缓存，shutdown 时关闭
+    app.state.platform_client = PlatformClient()
     log_event(
         "pipeline_started",
         host=settings.PIPELINE_HOST,
@@ -91,3 +94,8 @@ def on_startup():
         data_dir=settings.PIPELINE_DATA_DIR,
         public_base_url=settings.PUBLIC_BASE_URL,
     )
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    app.state.platform_client.close()
@@ -4,7 +4,7 @@ from typing import Any, Dict, List, Optional, Literal
 
 class StepInfo(BaseModel):
     """处理步骤信息"""
-    name: Literal["SEGMENT", "BACKGROUND", "COMPOSE", "TEMPLATE_RESOLVE", "MANIFEST_LOAD", "RENDER", "STORE"]
+    name: Literal["SEGMENT", "BACKGROUND", "COMPOSE", "TEMPLATE_RESOLVE", "MANIFEST_LOAD", "SEGMENTATION", "RENDER", "STORE"]
     ms: int
 
 
@@ -30,7 +30,7 @@ from app.services.manifest_loader import (
 from app.services.render_engine import RenderEngine, RenderError
 from app.services.storage_manager import StorageManager, StorageError
 from app.services.rules_loader import RulesLoader
-from app.clients.platform_client import PlatformClient, PlatformResolveError
+from app.clients.platform_client import PlatformResolveError
 from app.services.segmentation.segmentation_service import SegmentationService
 from app.config import settings
 from PIL import Image
@@ -323,9 +323,8 @@ async def process_v2(req: PipelineV2Request, request: Request):
                         if "quality" in seg_config:
                             hint_params["quality"] = seg_config["quality"]
                     
-                    # 调用 platform resolve
-                    platform_client = PlatformClient()
-                    execution_plan = platform_client.resolve(
+                    # 调用 platform resolve（共享 client：复用连接池与 resolve 缓存）
+                    execution_plan = request.app.state.platform_client.resolve(
                         template_code=req.templateCode,
                         version_semver=req.versionSemver,
                         prefer=prefer,
@@ -482,7 +481,9 @@ async def process_v2(req: PipelineV2Request, request: Request):
         if needs_segmentation:
             seg_start = time.time()
             try:
-                segmentation_service = SegmentationService()
+                segmentation_service = SegmentationService(
+                    platform_client=request.app.state.platform_client
+                )
                 cutout_image, seg_notes_list = segmentation_service.segment(
                     raw_image=raw_image,
                     template_code=req.templateCode,
@@ -361,10 +361,13 @@ class ManifestLoader:
         """
         print(f"[ManifestLoader] Starting asset validation for template_dir={self.template_dir}")
         
+        # 每个资源目录只 scandir 一次，之后按文件名查集合
+        dir_listings: Dict[Path, set] = {}
+        
         # 校验 background 文件存在
         background_path = Path(runtime_spec["background"]["path"])
         print(f"[ManifestLoader] Checking background file: {background_path}")
-        if not background_path.exists():
+        if not self._asset_exists(background_path, dir_listings):
             print(f"[ManifestLoader] ❌ FAILED: Background file not found: {background_path}")
             print(f"[ManifestLoader]   Template dir exists: {self.template_dir.exists()}")
             print(f"[ManifestLoader]   Template dir contents: {list(self.template_dir.iterdir()) if self.template_dir.exists() else 'N/A'}")
@@ -380,7 +383,7 @@ class ManifestLoader:
             sticker_path = Path(sticker["path"])
             sticker_id = sticker.get('id', f'index_{idx}')
             print(f"[ManifestLoader] Checking sticker[{idx}] (id={sticker_id}): {sticker_path}")
-            if not sticker_path.exists():
+            if not self._asset_exists(sticker_path, dir_listings):
                 print(f"[ManifestLoader] ❌ FAILED: Sticker file not found: {sticker_path} (sticker id: {sticker_id})")
                 raise ManifestValidationError(
                     f"Sticker file not found: {sticker_path} (sticker id: {sticker_id})"
@@ -389,6 +392,30 @@ class ManifestLoader:
         
         print(f"[ManifestLoader] ✅ All asset files validation passed!")
     
+    @staticmethod
+    def _asset_exists(path: Path, dir_listings: Dict[Path, set]) -> bool:
+        """
+        判断资源文件是否存在，同一目录的列表只读取一次。
+        
+        Args:
+            path: 资源文件路径
+            dir_listings: 目录 -> 文件名集合 的缓存（由调用方持有）
+            
+        Returns:
+            True 如果文件存在
+        """
+        parent = path.parent
+        if parent not in dir_listings:
+            try:
+                with os.scandir(parent) as entries:
+                    dir_listings[parent] = {entry.name for entry in entries}
+            except OSError:
+                dir_listings[parent] = set()
+        if path.name in dir_listings[parent]:
+            return True
+        # 大小写不敏感的文件系统上文件名可能不完全一致，未命中时回退到 exists()
+        return path.exists()
+    
     # 兼容方法：保持向后兼容
     def load(self) -> Dict[str, Any]:
         """
@@ -14,9 +14,12 @@ Single Responsibility: Image composition and rendering.
 """
 
 import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from PIL import Image
 from typing import Dict, Any, List, Optional
+from app.config import settings
 from app.utils.image_ops import fit_or_fill, open_image
 
 
@@ -25,6 +28,66 @@ class RenderError(Exception):
     pass
 
 
+class _AssetCache:
+    """
+    素材解码缓存（LRU，按解码后的字节数限制总大小）。
+    
+    key 为 (路径, mtime_ns, 文件大小)：文件被改写后 mtime 或大小变化，自动重新解码。
+    缓存中的图片是共享对象，调用方不得原地修改。
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+    
+    def get_or_load(self, path: Path, max_bytes: int) -> Image.Image:
+        """读取缓存，未命中时解码并写入（超过 max_bytes 的图片不缓存）"""
+        stat = path.stat()
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                return image
+        
+        image = open_image(str(path))
+        size = self._image_nbytes(image)
+        if size > max_bytes:
+            return image
+        
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = image
+                self._nbytes += size
+            while self._nbytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= self._image_nbytes(evicted)
+        return image
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+    
+    @staticmethod
+    def _image_nbytes(image: Image.Image) -> int:
+        """解码后图片占用的字节数（按宽 x 高 x 通道数估算）"""
+        return image.width * image.height * len(image.getbands())
+
+
+_asset_cache = _AssetCache()
+
+
+def _open_asset(path: Path) -> Image.Image:
+    """读取素材图片（settings.RENDER_ASSET_CACHE_MB > 0 时走解码缓存，否则每次解码）"""
+    max_bytes = settings.RENDER_ASSET_CACHE_MB * 1024 * 1024
+    if max_bytes <= 0:
+        return open_image(str(path))
+    return _asset_cache.get_or_load(path, max_bytes)
+
+
 class RenderEngine:
     """
     Handles image composition and rendering based on runtime_spec.
@@ -48,7 +111,7 @@ class RenderEngine:
                 Expected structure:
                 {
                     "output": {"width": 1800, "height": 1200, "format": "png"},
-                    "background": {"path": "绝对路径"},
+                    "background": {"path": "绝对路径"},  # 也可以用 {"image": PIL Image}（已解码）
                     "photos": [
                         {"id": "p1", "source": "raw", "x": 100, "y": 200, "w": 800, "h": 900, "fit": "cover", "z": 0}
                     ],
@@ -56,6 +119,7 @@ class RenderEngine:
                         {"id": "s1", "path": "绝对路径", "x": 50, "y": 50, "w": 100, "h": 100, "rotate": 0, "opacity": 1.0, "z": 0}
                     ]
                 }
+                背景和贴纸都可以用 "image"（已解码的 PIL Image）代替 "path"，跳过读盘和解码。
         """
         self.runtime_spec = runtime_spec
     
@@ -85,10 +149,9 @@ class RenderEngine:
             output = self.runtime_spec["output"]
             canvas = Image.new("RGBA", (output["width"], output["height"]), (0, 0, 0, 0))
             
-            # 2. 渲染背景
-            background_path = Path(self.runtime_spec["background"]["path"])
-            if background_path.exists():
-                background = open_image(str(background_path))
+            # 2. 渲染背景（优先使用已解码的 background.image，否则按 background.path 读取）
+            background = self._load_layer_image(self.runtime_spec["background"])
+            if background is not None:
                 # 调整背景尺寸以适应画布
                 background = background.resize((output["width"], output["height"]), Image.LANCZOS)
                 canvas.alpha_composite(background, (0, 0))
@@ -125,6 +188,26 @@ class RenderEngine:
         except Exception as e:
             raise RenderError(f"Failed to render image: {e}") from e
     
+    @staticmethod
+    def _load_layer_image(layer: Dict[str, Any]) -> Optional[Image.Image]:
+        """
+        读取背景/贴纸图层的图片（RGBA）。
+        
+        layer 中有已解码的 "image"（PIL Image）时直接使用，否则按 "path" 读取（开启时走解码缓存）；
+        文件不存在时返回 None。返回的可能是共享对象，调用方不得原地修改。
+        """
+        image = layer.get("image")
+        if image is not None:
+            return image if image.mode == "RGBA" else image.convert("RGBA")
+        
+        path = layer.get("path")
+        if not path:
+            return None
+        path = Path(path)
+        if not path.exists():
+            return None
+        return _open_asset(path)
+    
     def _render_photo(self, canvas: Image.Image, photo: Dict[str, Any], raw_image: Image.Image, artifacts: Optional[Dict[str, Image.Image]] = None) -> None:
         """
         渲染照片到画布。
@@ -178,7 +261,7 @@ class RenderEngine:
             sticker: Sticker configuration from runtime_spec
                 {
                     "id": "s1",
-                    "path": "绝对路径",
+                    "path": "绝对路径",  # 或 "image": 已解码的 PIL Image
                     "x": 50,  # 像素坐标
                     "y": 50,  # 像素坐标
                     "w": 100,  # 像素尺寸
@@ -188,18 +271,18 @@ class RenderEngine:
                     "z": 0
                 }
         """
-        sticker_path = Path(sticker["path"])
-        if not sticker_path.exists():
+        # 加载贴纸（共享对象，先复制再修改）
+        sticker_img = self._load_layer_image(sticker)
+        if sticker_img is None:
             return
         
-        # 加载贴纸
-        sticker_img = open_image(str(sticker_path))
-        
         # 调整尺寸
         w = sticker["w"]
         h = sticker["h"]
         if w > 0 and h > 0:
             sticker_img = sticker_img.resize((w, h), Image.LANCZOS)
+        else:
+            sticker_img = sticker_img.copy()
         
         # 应用旋转
         rotate = sticker.get("rotate", 0)
@@ -30,12 +30,24 @@ class SegmentationService:
     3. Fallback to raw if rembg fails (based on rules.segmentation.fallback)
     """
     
-    def __init__(self):
-        """Initialize the service."""
+    def __init__(self, platform_client: Optional[PlatformClient] = None):
+        """
+        Initialize the service.
+        
+        Args:
+            platform_client: 共享的 PlatformClient（复用连接池与 resolve 缓存，由调用方负责关闭）；
+                不传时自建一个，用完后调用 close() 释放
+        """
         self.third_party_provider = ThirdPartySegmentationProvider()
-        self.platform_client = PlatformClient()
+        self._owns_platform_client = platform_client is None
+        self.platform_client = PlatformClient() if platform_client is None else platform_client
         self.rembg_service = SegmentService()
     
+    def close(self) -> None:
+        """关闭自建的 PlatformClient（注入的共享 client 不关闭）"""
+        if self._owns_platform_client:
+            self.platform_client.close()
+    
     def segment(
         self,
         raw_image: Image.Image,
@@ -150,7 +150,7 @@ def main():
         print("- 集成测试: 模块可以协同工作")
         print()
         print("下一步：")
-        print("1. 运行完整单元测试: pytest tests/test_template_resolver.py tests/test_render_engine.py -v")
+        print("1. 运行完整单元测试: pytest tests/test_template_resolver.py tests/test_render_engine_v2.py -v")
         print("2. 实现 ManifestLoader 模块")
         print("3. 实现 StorageManager 模块")
         print("4. 在路由中集成所有模块")
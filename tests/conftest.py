@@ -1,9 +1,11 @@
 # tests/conftest.py
+import io
 import sys
 from pathlib import Path
 
 import pytest
 from fastapi.testclient import TestClient
+from PIL import Image
 
 # =========================================================
 # 确保 pytest 运行时能找到项目根目录（image-pipeline）
@@ -17,12 +19,56 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 # 现在再导入 app.main 就一定能找到
-from app.main import app
+from app.main import app as fastapi_app
 
 
-@pytest.fixture()
-def client():
+@pytest.fixture(scope="session")
+def app():
     """
-    FastAPI TestClient fixture
+    FastAPI 应用（app.main 中的单例，整个测试会话共享）
     """
-    return TestClient(app)
+    return fastapi_app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """
+    FastAPI TestClient fixture（整个测试会话共享一个；测试只通过 monkeypatch 修改依赖，不修改 app 状态）
+    
+    以上下文管理器方式进入，startup / shutdown 事件在整个会话中各执行一次。
+    """
+    with TestClient(app) as c:
+        yield c
+
+
+def _encode_solid_image(size, color, format, **save_kwargs):
+    """把纯色 RGB 图编码为指定格式的字节"""
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=color).save(buf, format=format, **save_kwargs)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def bg_png_bytes():
+    """
+    背景图 PNG 字节（1024x1024 绿色，整个测试会话只编码一次，fixture 中直接 write_bytes）
+    """
+    return _encode_solid_image((1024, 1024), (0, 255, 0), "PNG", compress_level=1)
+
+
+@pytest.fixture(scope="session")
+def raw_jpg_bytes():
+    """
+    原始图 JPEG 字节（800x1200 红色，整个测试会话只编码一次）
+    """
+    return _encode_solid_image((800, 1200), (255, 0, 0), "JPEG")
+
+
+@pytest.fixture(scope="session")
+def temp_raw_image(raw_jpg_bytes, tmp_path_factory):
+    """
+    临时原始图像（800x1200 红色 JPEG；测试只读取其路径，不得修改）
+    """
+    raw_path = tmp_path_factory.mktemp("raw") / "raw.jpg"
+    raw_path.write_bytes(raw_jpg_bytes)
+    return raw_path
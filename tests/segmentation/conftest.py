@@ -0,0 +1,97 @@
+"""
+分割相关测试的 fixtures（PIL / httpx / respx 相关的都放在这里，只在 tests/segmentation 下生效）
+"""
+
+import io
+import pytest
+import httpx
+from PIL import Image
+from types import MappingProxyType
+from app.services.segmentation.third_party_provider import ThirdPartySegmentationProvider
+
+
+REMOVEBG_URL = "https://api.remove.bg/v1.0/removebg"
+
+# HTTP 边界全部 mock，不做真实抠图，用极小的图即可（只减少编解码开销，不影响断言）
+IMAGE_SIZE = (8, 8)
+
+
+@pytest.fixture(scope="session")
+def sample_image():
+    """创建测试图片（整个会话共享，测试中只读；需要修改时先 .copy()）"""
+    img = Image.new("RGB", IMAGE_SIZE, color=(255, 0, 0))
+    return img
+
+
+@pytest.fixture(scope="session")
+def rgba_result_image():
+    """创建 RGBA 结果图片（模拟 remove.bg 返回；整个会话共享，测试中只读）"""
+    img = Image.new("RGBA", IMAGE_SIZE, color=(255, 0, 0, 255))
+    # 添加一些透明区域（左上角）
+    img.paste((0, 0, 0, 0), (0, 0, 2, 2))
+    return img
+
+
+@pytest.fixture(scope="session")
+def rgba_result_png_bytes(rgba_result_image):
+    """rgba_result_image 编码后的 PNG 字节（mock 响应体；整个会话只编码一次，compress_level=1 即可）"""
+    buf = io.BytesIO()
+    rgba_result_image.save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def sample_image_jpeg_bytes(sample_image):
+    """sample_image 编码后的 JPEG 字节（bytes 输入用；整个会话只编码一次）"""
+    buf = io.BytesIO()
+    sample_image.save(buf, format="JPEG", quality=30)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def sample_image_jpeg_path(sample_image_jpeg_bytes, tmp_path_factory):
+    """写到磁盘的 sample_image JPEG 文件（路径输入用；整个会话只写一次）"""
+    path = tmp_path_factory.mktemp("seg_input") / "test.jpg"
+    path.write_bytes(sample_image_jpeg_bytes)
+    return path
+
+
+@pytest.fixture(scope="session")
+def execution_plan():
+    """
+    创建 execution plan（整个会话共享）
+    
+    用 MappingProxyType 包成只读：provider 只做 .get() 读取，一旦写入会立即报错；
+    需要定制的用例自行构造 plan。
+    """
+    return MappingProxyType({
+        "providerCode": "removebg",
+        "endpoint": REMOVEBG_URL,
+        "auth": {
+            "type": "api_key",
+            "apiKey": "test_api_key_12345",
+        },
+        "timeoutMs": 6000,
+        "params": {
+            "size": "auto",
+            "format": "png",
+        },
+    })
+
+
+@pytest.fixture(scope="session")
+def provider():
+    """ThirdPartySegmentationProvider（无状态，整个会话共享；httpx.Client 在 process() 内才创建）"""
+    return ThirdPartySegmentationProvider()
+
+
+@pytest.fixture
+def mocked_removebg(respx_mock, rgba_result_png_bytes):
+    """
+    在 transport 层拦截 remove.bg 请求（respx），provider 使用真实的 httpx.Client
+    
+    默认返回 200 + rgba_result_png_bytes；用例可改写 route 的 return_value / side_effect。
+    """
+    return respx_mock.post(REMOVEBG_URL).mock(
+        return_value=httpx.Response(200, content=rgba_result_png_bytes)
+    )
@@ -0,0 +1,90 @@
+"""
+测试 ThirdPartySegmentationProvider
+
+测试用例：
+1. 成功调用 remove.bg API（mock）
+2. API key 错误：抛出异常
+3. 超时：抛出异常
+4. 输入图片格式处理（PIL Image、bytes、文件路径）
+
+HTTP 调用通过 respx 在 transport 层拦截，provider 使用真实的 httpx.Client。
+fixtures 见 tests/segmentation/conftest.py。
+"""
+
+import pytest
+import httpx
+from app.services.segmentation.third_party_provider import SegmentationProviderError
+
+
+def test_removebg_success(provider, sample_image, execution_plan, mocked_removebg):
+    """测试 remove.bg 成功调用"""
+    result = provider.process(sample_image, execution_plan)
+    
+    # 验证结果
+    assert result.mode == "RGBA"
+    assert result.size == sample_image.size
+    
+    # 验证请求参数
+    assert mocked_removebg.call_count == 1
+    request = mocked_removebg.calls.last.request
+    assert request.headers["Content-Type"].startswith("multipart/form-data")
+    assert request.headers["X-Api-Key"] == "test_api_key_12345"
+
+
+def test_removebg_api_key_error(provider, sample_image, execution_plan, mocked_removebg):
+    """测试 API key 错误"""
+    mocked_removebg.return_value = httpx.Response(401, json={"errors": [{"title": "Unauthorized"}]})
+    
+    with pytest.raises(SegmentationProviderError, match=r"remove\.bg API call failed") as exc_info:
+        provider.process(sample_image, execution_plan)
+    
+    assert exc_info.value.status_code == 401
+
+
+def test_removebg_timeout(provider, sample_image, execution_plan, mocked_removebg):
+    """测试超时"""
+    mocked_removebg.side_effect = httpx.TimeoutException("Request timeout")
+    
+    with pytest.raises(SegmentationProviderError, match=r"(?i)timeout"):
+        provider.process(sample_image, execution_plan)
+
+
+def test_removebg_missing_api_key(provider, sample_image):
+    """测试缺少 API key"""
+    execution_plan = {
+        "providerCode": "removebg",
+        "endpoint": "https://api.remove.bg/v1.0/removebg",
+        "auth": {},  # 没有 apiKey
+        "timeoutMs": 6000,
+    }
+    
+    with pytest.raises(SegmentationProviderError, match="Missing API key"):
+        provider.process(sample_image, execution_plan)
+
+
+def test_removebg_unsupported_provider(provider, sample_image):
+    """测试不支持的 provider"""
+    execution_plan = {
+        "providerCode": "unknown_provider",
+        "endpoint": "https://api.example.com/removebg",
+        "auth": {"apiKey": "test"},
+        "timeoutMs": 6000,
+    }
+    
+    with pytest.raises(SegmentationProviderError, match="Unsupported provider"):
+        provider.process(sample_image, execution_plan)
+
+
+@pytest.mark.parametrize("input_kind", ["pil", "bytes", "path"])
+def test_input_image(provider, input_kind, request, execution_plan, mocked_removebg):
+    """测试输入为 PIL Image / bytes / 文件路径"""
+    input_fixture = {
+        "pil": "sample_image",
+        "bytes": "sample_image_jpeg_bytes",
+        "path": "sample_image_jpeg_path",
+    }[input_kind]
+    raw_image = request.getfixturevalue(input_fixture)
+    
+    result = provider.process(raw_image, execution_plan)
+    
+    assert result.mode == "RGBA"
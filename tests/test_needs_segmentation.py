@@ -9,209 +9,131 @@
 """
 
 import json
-import tempfile
-import zipfile
 from pathlib import Path
-from PIL import Image
 import pytest
-from fastapi.testclient import TestClient
 
+try:
+    import orjson
+except ImportError:  # orjson 是可选的开发依赖，缺失时回退到标准库 json
+    orjson = None
 
-@pytest.fixture
-def temp_template_dir_raw():
-    """创建临时模板目录，source=raw"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        template_dir = Path(tmpdir)
-        
-        # 创建 manifest.json（source=raw）
-        manifest = {
-            "manifestVersion": 1,
-            "templateCode": "tpl_test",
-            "versionSemver": "0.1.0",
-            "output": {
-                "width": 1024,
-                "height": 1024,
-                "format": "png"
-            },
-            "assets": {
-                "basePath": "assets"
-            },
-            "compose": {
-                "background": "bg.png",
-                "photos": [
-                    {
-                        "id": "p1",
-                        "source": "raw",  # raw 模式
-                        "x": 100,
-                        "y": 100,
-                        "w": 800,
-                        "h": 800,
-                        "fit": "cover",
-                        "z": 0
-                    }
-                ],
-                "stickers": []
-            }
-        }
-        
-        (template_dir / "manifest.json").write_text(
-            json.dumps(manifest, indent=2), encoding="utf-8"
-        )
-        
-        # 创建 assets 目录和背景图
-        assets_dir = template_dir / "assets"
-        assets_dir.mkdir()
-        
-        # 创建背景图
-        bg_image = Image.new("RGB", (1024, 1024), color=(0, 255, 0))
-        bg_image.save(assets_dir / "bg.png", format="PNG")
-        
-        yield template_dir
+from app.clients.platform_client import PlatformClient
+from app.services.segmentation.segmentation_service import SegmentationService
+from app.services.template_resolver import TemplateResolver
 
 
-@pytest.fixture
-def temp_template_dir_cutout():
-    """创建临时模板目录，source=cutout"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        template_dir = Path(tmpdir)
-        
-        # 创建 manifest.json（source=cutout）
-        manifest = {
-            "manifestVersion": 1,
-            "templateCode": "tpl_test",
-            "versionSemver": "0.1.0",
-            "output": {
-                "width": 1024,
-                "height": 1024,
-                "format": "png"
-            },
-            "assets": {
-                "basePath": "assets"
-            },
-            "compose": {
-                "background": "bg.png",
-                "photos": [
-                    {
-                        "id": "p1",
-                        "source": "cutout",  # cutout 模式
-                        "x": 100,
-                        "y": 100,
-                        "w": 800,
-                        "h": 800,
-                        "fit": "cover",
-                        "z": 0
-                    }
-                ],
-                "stickers": []
-            }
-        }
-        
-        (template_dir / "manifest.json").write_text(
-            json.dumps(manifest, indent=2), encoding="utf-8"
-        )
-        
-        # 创建 assets 目录和背景图
-        assets_dir = template_dir / "assets"
-        assets_dir.mkdir()
-        
-        # 创建背景图
-        bg_image = Image.new("RGB", (1024, 1024), color=(0, 255, 0))
-        bg_image.save(assets_dir / "bg.png", format="PNG")
-        
-        yield template_dir
+def dumps_json(obj) -> bytes:
+    """序列化为紧凑的 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
 
 
-@pytest.fixture
-def temp_template_zip(temp_template_dir_raw, tmp_path):
-    """创建模板 zip 文件（用于 raw 模式测试）"""
-    zip_path = tmp_path / "template.zip"
-    
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file_path in temp_template_dir_raw.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(temp_template_dir_raw)
-                zipf.write(file_path, arcname)
-    
-    return zip_path
+def loads_json(data: bytes):
+    """解析 JSON 字节"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 @pytest.fixture
-def temp_template_zip_cutout(temp_template_dir_cutout, tmp_path):
-    """创建模板 zip 文件（用于 cutout 模式测试）"""
-    zip_path = tmp_path / "template.zip"
+def temp_template_dir_raw(bg_png_bytes, tmp_path):
+    """创建临时模板目录，source=raw"""
+    template_dir = tmp_path
     
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file_path in temp_template_dir_cutout.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(temp_template_dir_cutout)
-                zipf.write(file_path, arcname)
+    # 创建 manifest.json（source=raw）
+    manifest = {
+        "manifestVersion": 1,
+        "templateCode": "tpl_test",
+        "versionSemver": "0.1.0",
+        "output": {
+            "width": 1024,
+            "height": 1024,
+            "format": "png"
+        },
+        "assets": {
+            "basePath": "assets"
+        },
+        "compose": {
+            "background": "bg.png",
+            "photos": [
+                {
+                    "id": "p1",
+                    "source": "raw",  # raw 模式
+                    "x": 100,
+                    "y": 100,
+                    "w": 800,
+                    "h": 800,
+                    "fit": "cover",
+                    "z": 0
+                }
+            ],
+            "stickers": []
+        }
+    }
     
-    return zip_path
-
-
-@pytest.fixture
-def temp_raw_image(tmp_path):
-    """创建临时原始图像"""
-    raw_path = tmp_path / "raw.jpg"
-    img = Image.new("RGB", (800, 1200), color=(255, 0, 0))
-    img.save(raw_path, format="JPEG")
-    return raw_path
-
-
-@pytest.fixture
-def mock_template_server(temp_template_zip, monkeypatch):
-    """模拟模板下载服务器"""
-    import requests
-    
-    def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        with open(temp_template_zip, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
-    
-    monkeypatch.setattr(requests, "get", mock_get)
+    (template_dir / "manifest.json").write_bytes(dumps_json(manifest))
+    
+    # 创建 assets 目录和背景图
+    assets_dir = template_dir / "assets"
+    assets_dir.mkdir()
+    
+    # 写入背景图
+    (assets_dir / "bg.png").write_bytes(bg_png_bytes)
+    
+    return template_dir
 
 
 @pytest.fixture
-def mock_template_server_cutout(temp_template_zip_cutout, monkeypatch):
-    """模拟模板下载服务器（cutout 模式）"""
-    import requests
-    
-    def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        with open(temp_template_zip_cutout, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
-    
-    monkeypatch.setattr(requests, "get", mock_get)
+def temp_template_dir_cutout(bg_png_bytes, tmp_path):
+    """创建临时模板目录，source=cutout"""
+    template_dir = tmp_path
+    
+    # 创建 manifest.json（source=cutout）
+    manifest = {
+        "manifestVersion": 1,
+        "templateCode": "tpl_test",
+        "versionSemver": "0.1.0",
+        "output": {
+            "width": 1024,
+            "height": 1024,
+            "format": "png"
+        },
+        "assets": {
+            "basePath": "assets"
+        },
+        "compose": {
+            "background": "bg.png",
+            "photos": [
+                {
+                    "id": "p1",
+                    "source": "cutout",  # cutout 模式
+                    "x": 100,
+                    "y": 100,
+                    "w": 800,
+                    "h": 800,
+                    "fit": "cover",
+                    "z": 0
+                }
+            ],
+            "stickers": []
+        }
+    }
+    
+    (template_dir / "manifest.json").write_bytes(dumps_json(manifest))
+    
+    # 创建 assets 目录和背景图
+    assets_dir = template_dir / "assets"
+    assets_dir.mkdir()
+    
+    # 写入背景图
+    (assets_dir / "bg.png").write_bytes(bg_png_bytes)
+    
+    return template_dir
 
 
 def test_needs_segmentation_source_raw(
-    client, temp_template_dir_raw, temp_template_zip, temp_raw_image, mock_template_server, monkeypatch
+    client, temp_template_dir_raw, temp_raw_image, monkeypatch
 ):
     """
     测试场景 1：source=raw，needs_cutout=false，流程正常
@@ -222,12 +144,8 @@ def test_needs_segmentation_source_raw(
     - needs_segmentation=false
     - 流程正常完成（ok=true）
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
+    # resolve 被 mock 直接返回模板目录，不会下载也不会校验 checksum
+    checksum = "0" * 64
     
     # Mock TemplateResolver
     def mock_resolve(self):
@@ -266,7 +184,7 @@ def test_needs_segmentation_source_raw(
 
 
 def test_needs_segmentation_source_cutout_disabled(
-    client, temp_template_dir_cutout, temp_template_zip_cutout, temp_raw_image, mock_template_server_cutout, monkeypatch
+    client, temp_template_dir_cutout, temp_raw_image, monkeypatch
 ):
     """
     测试场景 2：source=cutout 但 rules.enabled=false，needs_segmentation=false
@@ -277,12 +195,8 @@ def test_needs_segmentation_source_cutout_disabled(
     - needs_segmentation=false（因为 seg_enabled=false）
     - 流程正常完成（仍走 raw 模式）
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip_cutout, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
+    # resolve 被 mock 直接返回模板目录，不会下载也不会校验 checksum
+    checksum = "0" * 64
     
     # Mock TemplateResolver
     def mock_resolve(self):
@@ -321,7 +235,7 @@ def test_needs_segmentation_source_cutout_disabled(
 
 
 def test_needs_segmentation_source_cutout_enabled(
-    client, temp_template_dir_cutout, temp_template_zip_cutout, temp_raw_image, mock_template_server_cutout, monkeypatch
+    client, temp_template_dir_cutout, temp_raw_image, monkeypatch
 ):
     """
     测试场景 3：source=cutout 且 rules.enabled=true，needs_segmentation=true
@@ -332,31 +246,16 @@ def test_needs_segmentation_source_cutout_enabled(
     - needs_segmentation=true
     - 流程正常完成
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 创建 rules.json，设置 segmentation.enabled=true
-    assets_dir = temp_template_dir_cutout / "assets"
+    # 创建 rules.json（RulesLoader 从模板根目录读取），设置 segmentation.enabled=true
     rules = {
         "segmentation.enabled": True,
         "segmentation.prefer": ["removebg"],
         "segmentation.timeoutMs": 5000
     }
-    (assets_dir / "rules.json").write_text(
-        json.dumps(rules, indent=2), encoding="utf-8"
-    )
-    
-    # 重新创建 zip（包含 rules.json）
-    zip_path = temp_template_zip_cutout.parent / "template_with_rules.zip"
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file_path in temp_template_dir_cutout.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(temp_template_dir_cutout)
-                zipf.write(file_path, arcname)
-    
-    # 计算 checksum
-    with open(zip_path, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
+    (temp_template_dir_cutout / "rules.json").write_bytes(dumps_json(rules))
+    
+    # resolve 被 mock 直接返回模板目录，不会下载也不会校验 checksum，无需重新打包 zip
+    checksum = "0" * 64
     
     # Mock TemplateResolver
     def mock_resolve(self):
@@ -364,27 +263,15 @@ def test_needs_segmentation_source_cutout_enabled(
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
-    # Mock 下载服务器返回新的 zip
-    import requests
-    def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        with open(zip_path, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
-    
-    monkeypatch.setattr(requests, "get", mock_get)
+    # 只验证判定逻辑：platform resolve 和抠图都 mock 掉（不访问 platform，不下载 rembg 模型）
+    def mock_platform_resolve(self, **kwargs):
+        return {"providerCode": "removebg", "endpoint": "https://api.remove.bg/v1.0/removebg"}
+    
+    def mock_segment(self, raw_image, **kwargs):
+        return raw_image.convert("RGBA"), []
+    
+    monkeypatch.setattr(PlatformClient, "resolve", mock_platform_resolve)
+    monkeypatch.setattr(SegmentationService, "segment", mock_segment)
     
     payload = {
         "templateCode": "tpl_test",
@@ -417,17 +304,14 @@ def test_needs_segmentation_source_cutout_enabled(
 
 
 def test_needs_segmentation_multiple_photos(
-    client, temp_template_dir_raw, temp_template_zip, temp_raw_image, mock_template_server, monkeypatch
+    client, temp_template_dir_raw, temp_raw_image, monkeypatch
 ):
     """
     测试场景 4：多个 photos，其中一个 source=cutout，needs_cutout=true
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
     # 修改 manifest，添加多个 photos（一个 raw，一个 cutout）
     manifest_path = temp_template_dir_raw / "manifest.json"
-    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    manifest = loads_json(manifest_path.read_bytes())
     manifest["compose"]["photos"].append({
         "id": "p2",
         "source": "cutout",  # 第二个 photo 是 cutout
@@ -438,19 +322,10 @@ def test_needs_segmentation_multiple_photos(
         "fit": "cover",
         "z": 1
     })
-    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    manifest_path.write_bytes(dumps_json(manifest))
     
-    # 重新创建 zip
-    zip_path = temp_template_zip.parent / "template_multi.zip"
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file_path in temp_template_dir_raw.rglob("*"):
-            if file_path.is_file():
-                arcname = file_path.relative_to(temp_template_dir_raw)
-                zipf.write(file_path, arcname)
-    
-    # 计算 checksum
-    with open(zip_path, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
+    # resolve 被 mock 直接返回模板目录，不会下载也不会校验 checksum
+    checksum = "0" * 64
     
     # Mock TemplateResolver
     def mock_resolve(self):
@@ -458,28 +333,6 @@ def test_needs_segmentation_multiple_photos(
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
-    # Mock 下载服务器
-    import requests
-    def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        with open(zip_path, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
-    
-    monkeypatch.setattr(requests, "get", mock_get)
-    
     payload = {
         "templateCode": "tpl_test",
         "versionSemver": "0.1.0",
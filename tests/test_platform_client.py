@@ -5,33 +5,31 @@
 1. resolve 成功：返回 execution plan
 2. resolve 失败：抛出 PlatformResolveError
 3. 网络超时：正确处理
+
+HTTP 调用通过 respx 在 transport 层拦截，PlatformClient 使用真实的 httpx.Client。
 """
 
+import json
+from types import SimpleNamespace
+
 import pytest
 import httpx
-from unittest.mock import patch, MagicMock
+from app.clients import platform_client as platform_client_module
 from app.clients.platform_client import PlatformClient, PlatformResolveError
 
 
-def test_platform_client_resolve_success():
+RESOLVE_URL = "http://localhost:9000/api/v1/ai/resolve"
+
+
+def test_platform_client_resolve_success(respx_mock):
     """测试 resolve 成功"""
-    # Mock httpx 响应
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
+    route = respx_mock.post(RESOLVE_URL).mock(return_value=httpx.Response(200, json={
         "providerCode": "removebg",
         "endpoint": "https://api.remove.bg/v1.0/removebg",
         "timeoutMs": 5000,
-    }
-    mock_response.raise_for_status = MagicMock()
-    
-    with patch("httpx.Client") as mock_client_class:
-        mock_client = MagicMock()
-        mock_client.__enter__.return_value = mock_client
-        mock_client.__exit__.return_value = None
-        mock_client.post.return_value = mock_response
-        mock_client_class.return_value = mock_client
-        
-        client = PlatformClient(base_url="http://localhost:9000", timeout_ms=5000)
+    }))
+
+    with PlatformClient(base_url="http://localhost:9000", timeout_ms=5000) as client:
         result = client.resolve(
             template_code="tpl_002",
             version_semver="0.1.2",
@@ -39,38 +37,37 @@ def test_platform_client_resolve_success():
             timeout_ms=6000,
             hint_params={"output": "rgba"},
         )
-        
-        assert result["providerCode"] == "removebg"
-        assert result["endpoint"] == "https://api.remove.bg/v1.0/removebg"
-        
-        # 验证请求参数
-        mock_client.post.assert_called_once()
-        call_args = mock_client.post.call_args
-        assert call_args[0][0] == "http://localhost:9000/api/v1/ai/resolve"
-        request_body = call_args[1]["json"]
-        assert request_body["capability"] == "segmentation"
-        assert request_body["templateCode"] == "tpl_002"
-        assert request_body["versionSemver"] == "0.1.2"
-        assert request_body["prefer"] == ["removebg", "rembg"]
-        assert request_body["constraints"]["timeoutMs"] == 6000
-        assert request_body["hintParams"]["output"] == "rgba"
-
-
-def test_platform_client_resolve_http_error():
-    """测试 resolve HTTP 错误"""
-    with patch("httpx.Client") as mock_client_class:
-        mock_client = MagicMock()
-        mock_client.__enter__.return_value = mock_client
-        mock_client.__exit__.return_value = None
-        mock_client.post.side_effect = httpx.HTTPStatusError(
-            "404 Not Found",
-            request=MagicMock(),
-            response=MagicMock(status_code=404),
-        )
-        mock_client_class.return_value = mock_client
-        
-        client = PlatformClient(base_url="http://localhost:9000")
-        
+
+    assert result["providerCode"] == "removebg"
+    assert result["endpoint"] == "https://api.remove.bg/v1.0/removebg"
+
+    # 验证请求参数
+    assert route.call_count == 1
+    request = route.calls.last.request
+    assert str(request.url) == RESOLVE_URL
+    request_body = json.loads(request.content)
+    assert request_body["capability"] == "segmentation"
+    assert request_body["templateCode"] == "tpl_002"
+    assert request_body["versionSemver"] == "0.1.2"
+    assert request_body["prefer"] == ["removebg", "rembg"]
+    assert request_body["constraints"]["timeoutMs"] == 6000
+    assert request_body["hintParams"]["output"] == "rgba"
+
+
+@pytest.mark.parametrize(
+    "mock_kwargs, expected_message",
+    [
+        ({"return_value": httpx.Response(404)}, "Platform resolve API call failed"),
+        ({"side_effect": httpx.TimeoutException("Request timeout")}, "Platform resolve API call failed"),
+        ({"side_effect": ValueError("Unexpected error")}, "Unexpected error during platform resolve"),
+    ],
+    ids=["http_error", "timeout", "unexpected_error"],
+)
+def test_platform_client_resolve_error(respx_mock, mock_kwargs, expected_message):
+    """测试 resolve 失败（HTTP 错误 / 超时 / 意外错误）统一抛出 PlatformResolveError"""
+    respx_mock.post(RESOLVE_URL).mock(**mock_kwargs)
+
+    with PlatformClient(base_url="http://localhost:9000", timeout_ms=1000) as client:
         with pytest.raises(PlatformResolveError) as exc_info:
             client.resolve(
                 template_code="tpl_002",
@@ -78,49 +75,99 @@ def test_platform_client_resolve_http_error():
                 prefer=["removebg"],
                 timeout_ms=6000,
             )
-        
-        assert "Platform resolve API call failed" in str(exc_info.value)
-
-
-def test_platform_client_resolve_timeout():
-    """测试 resolve 超时"""
-    with patch("httpx.Client") as mock_client_class:
-        mock_client = MagicMock()
-        mock_client.__enter__.return_value = mock_client
-        mock_client.__exit__.return_value = None
-        mock_client.post.side_effect = httpx.TimeoutException("Request timeout")
-        mock_client_class.return_value = mock_client
-        
-        client = PlatformClient(base_url="http://localhost:9000", timeout_ms=1000)
-        
-        with pytest.raises(PlatformResolveError) as exc_info:
+
+    assert expected_message in str(exc_info.value)
+
+
+def test_platform_client_resolve_invalid_hint_params(respx_mock):
+    """测试 hint_params 无法序列化时抛出 PlatformResolveError，且不发请求"""
+    with PlatformClient(base_url="http://localhost:9000") as client:
+        with pytest.raises(PlatformResolveError, match="Invalid hint_params"):
             client.resolve(
                 template_code="tpl_002",
                 version_semver="0.1.2",
                 prefer=["removebg"],
                 timeout_ms=6000,
+                hint_params={"output": object()},
             )
-        
-        assert "Platform resolve API call failed" in str(exc_info.value)
-
-
-def test_platform_client_resolve_unexpected_error():
-    """测试 resolve 意外错误"""
-    with patch("httpx.Client") as mock_client_class:
-        mock_client = MagicMock()
-        mock_client.__enter__.return_value = mock_client
-        mock_client.__exit__.return_value = None
-        mock_client.post.side_effect = ValueError("Unexpected error")
-        mock_client_class.return_value = mock_client
-        
-        client = PlatformClient(base_url="http://localhost:9000")
-        
-        with pytest.raises(PlatformResolveError) as exc_info:
+
+    assert respx_mock.calls.call_count == 0
+
+
+def test_platform_client_reuses_http_client(respx_mock):
+    """测试多次 resolve 复用同一个 httpx.Client，退出上下文后关闭"""
+    route = respx_mock.post(RESOLVE_URL).mock(return_value=httpx.Response(200, json={
+        "providerCode": "removebg",
+        "endpoint": "https://api.remove.bg/v1.0/removebg",
+    }))
+
+    with PlatformClient(base_url="http://localhost:9000", ttl_seconds=0) as client:
+        http_client = client._client
+        for _ in range(2):
             client.resolve(
                 template_code="tpl_002",
                 version_semver="0.1.2",
                 prefer=["removebg"],
                 timeout_ms=6000,
             )
-        
-        assert "Unexpected error during platform resolve" in str(exc_info.value)
+        assert client._client is http_client
+
+    assert route.call_count == 2
+    assert http_client.is_closed
+
+
+def test_platform_client_resolve_cached(respx_mock):
+    """测试相同参数的 resolve 在 TTL 内命中缓存，参数不同时重新请求"""
+    route = respx_mock.post(RESOLVE_URL).mock(return_value=httpx.Response(200, json={
+        "providerCode": "removebg",
+        "endpoint": "https://api.remove.bg/v1.0/removebg",
+        "auth": {"apiKey": "test_api_key"},
+    }))
+
+    with PlatformClient(base_url="http://localhost:9000", ttl_seconds=60) as client:
+        kwargs = dict(template_code="tpl_002", version_semver="0.1.2", prefer=["removebg"], timeout_ms=6000)
+
+        first = client.resolve(**kwargs)
+        first["providerCode"] = "mutated"  # 修改返回值（包括嵌套的 auth）不影响缓存
+        first["auth"]["apiKey"] = "mutated"
+        second = client.resolve(**kwargs)
+
+        assert route.call_count == 1
+        assert second["providerCode"] == "removebg"
+        assert second["auth"]["apiKey"] == "test_api_key"
+
+        client.resolve(**{**kwargs, "version_semver": "0.1.3"})
+        assert route.call_count == 2
+
+
+def test_platform_client_resolve_cache_expired(respx_mock, monkeypatch):
+    """测试缓存过期后重新请求"""
+
+    route = respx_mock.post(RESOLVE_URL).mock(return_value=httpx.Response(200, json={
+        "providerCode": "removebg",
+        "endpoint": "https://api.remove.bg/v1.0/removebg",
+    }))
+
+    now = [1000.0]
+    # 只替换 platform_client 模块内的 time 绑定，不影响 httpx 等其他模块使用的 time.monotonic
+    monkeypatch.setattr(platform_client_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    with PlatformClient(base_url="http://localhost:9000", ttl_seconds=60) as client:
+        kwargs = dict(template_code="tpl_002", version_semver="0.1.2", prefer=["removebg"], timeout_ms=6000)
+
+        client.resolve(**kwargs)
+        now[0] += 61
+        client.resolve(**kwargs)
+
+    assert route.call_count == 2
+
+
+def test_platform_client_timeout_split():
+    """测试连接超时快速失败，读写使用完整超时"""
+    with PlatformClient(base_url="http://localhost:9000", timeout_ms=5000) as client:
+        timeout = client._client.timeout
+
+    assert timeout.connect == 2.0
+    assert timeout.read == 5.0
+    assert timeout.write == 5.0
+    assert timeout.pool == 1.0
@@ -7,86 +7,124 @@
 3. needs_segmentation=false：不调用 resolve
 """
 
+import hashlib
 import json
-import tempfile
+import shutil
 import zipfile
-from pathlib import Path
-from PIL import Image
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
-from fastapi.testclient import TestClient
+import requests
 
+from app.clients.platform_client import PlatformClient
+from app.config import settings
+from app.services.segmentation.segmentation_service import SegmentationService
+from app.services.template_resolver import TemplateResolver
 
-@pytest.fixture
-def temp_template_dir_cutout_with_rules():
-    """创建临时模板目录，source=cutout，且有 rules.json（enabled=true）"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        template_dir = Path(tmpdir)
-        
-        # 创建 manifest.json（source=cutout）
-        manifest = {
-            "manifestVersion": 1,
-            "templateCode": "tpl_test",
-            "versionSemver": "0.1.0",
-            "output": {
-                "width": 1024,
-                "height": 1024,
-                "format": "png"
-            },
-            "assets": {
-                "basePath": "assets"
-            },
-            "compose": {
-                "background": "bg.png",
-                "photos": [
-                    {
-                        "id": "p1",
-                        "source": "cutout",  # cutout 模式
-                        "x": 100,
-                        "y": 100,
-                        "w": 800,
-                        "h": 800,
-                        "fit": "cover",
-                        "z": 0
-                    }
-                ],
-                "stickers": []
-            }
+
+class MockResponse:
+    """模拟 requests.get 的返回（模块级定义，避免每次请求重新创建类）"""
+    def __init__(self, content):
+        self.content = content
+        self.status_code = 200
+    
+    def raise_for_status(self):
+        pass
+    
+    def iter_content(self, chunk_size=8192):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+@pytest.fixture(scope="session")
+def temp_template_dir_cutout_with_rules(bg_png_bytes, tmp_path_factory):
+    """创建临时模板目录，source=cutout，且有 rules.json（enabled=true）（整个会话共享，测试中不得修改）"""
+    template_dir = tmp_path_factory.mktemp("template_cutout")
+    
+    # 创建 manifest.json（source=cutout）
+    manifest = {
+        "manifestVersion": 1,
+        "templateCode": "tpl_test",
+        "versionSemver": "0.1.0",
+        "output": {
+            "width": 1024,
+            "height": 1024,
+            "format": "png"
+        },
+        "assets": {
+            "basePath": "assets"
+        },
+        "compose": {
+            "background": "bg.png",
+            "photos": [
+                {
+                    "id": "p1",
+                    "source": "cutout",  # cutout 模式
+                    "x": 100,
+                    "y": 100,
+                    "w": 800,
+                    "h": 800,
+                    "fit": "cover",
+                    "z": 0
+                }
+            ],
+            "stickers": []
         }
-        
-        (template_dir / "manifest.json").write_text(
-            json.dumps(manifest, indent=2), encoding="utf-8"
-        )
-        
-        # 创建 rules.json（segmentation.enabled=true）
-        rules = {
-            "segmentation": {
-                "enabled": True,
-                "prefer": ["removebg", "rembg"],
-                "timeoutMs": 6000,
-                "output": "rgba"
-            }
+    }
+    
+    (template_dir / "manifest.json").write_text(
+        json.dumps(manifest, indent=2), encoding="utf-8"
+    )
+    
+    # 创建 rules.json（segmentation.enabled=true）
+    rules = {
+        "segmentation": {
+            "enabled": True,
+            "prefer": ["removebg", "rembg"],
+            "timeoutMs": 6000,
+            "output": "rgba"
         }
-        (template_dir / "rules.json").write_text(
-            json.dumps(rules, indent=2), encoding="utf-8"
-        )
-        
-        # 创建 assets 目录和背景图
-        assets_dir = template_dir / "assets"
-        assets_dir.mkdir()
-        
-        bg_image = Image.new("RGB", (1024, 1024), color=(0, 255, 0))
-        bg_image.save(assets_dir / "bg.png", format="PNG")
-        
-        yield template_dir
+    }
+    (template_dir / "rules.json").write_text(
+        json.dumps(rules, indent=2), encoding="utf-8"
+    )
+    
+    # 创建 assets 目录和背景图
+    assets_dir = template_dir / "assets"
+    assets_dir.mkdir()
+    
+    # 写入背景图（纯绿色，会话内预编码的 PNG 字节）
+    (assets_dir / "bg.png").write_bytes(bg_png_bytes)
+    
+    return template_dir
 
 
 @pytest.fixture
-def temp_template_zip_cutout_with_rules(temp_template_dir_cutout_with_rules, tmp_path):
+def temp_template_dir_cutout_rules_disabled(temp_template_dir_cutout_with_rules, tmp_path):
+    """复制会话模板目录并改写 rules.json（segmentation.enabled=false）"""
+    template_dir = tmp_path / "template"
+    shutil.copytree(temp_template_dir_cutout_with_rules, template_dir)
+    
+    rules = {
+        "segmentation": {
+            "enabled": False,  # 禁用
+            "prefer": ["removebg"],
+            "timeoutMs": 6000,
+        }
+    }
+    (template_dir / "rules.json").write_text(
+        json.dumps(rules, indent=2), encoding="utf-8"
+    )
+    
+    return template_dir
+
+
+@pytest.fixture(scope="session")
+def temp_template_zip_cutout_with_rules(temp_template_dir_cutout_with_rules, tmp_path_factory):
     """创建模板 zip 文件"""
-    zip_path = tmp_path / "template.zip"
+    zip_path = tmp_path_factory.mktemp("template_zip") / "template.zip"
     
-    with zipfile.ZipFile(zip_path, "w") as zipf:
+    # 模板内容是已压缩的 PNG 和很小的 JSON，用 ZIP_STORED 直接存储
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zipf:
         for file_path in temp_template_dir_cutout_with_rules.rglob("*"):
             if file_path.is_file():
                 arcname = file_path.relative_to(temp_template_dir_cutout_with_rules)
@@ -95,44 +133,62 @@ def temp_template_zip_cutout_with_rules(temp_template_dir_cutout_with_rules, tmp
     return zip_path
 
 
-@pytest.fixture
-def temp_raw_image(tmp_path):
-    """创建临时原始图像"""
-    raw_path = tmp_path / "raw.jpg"
-    img = Image.new("RGB", (800, 1200), color=(255, 0, 0))
-    img.save(raw_path, format="JPEG")
-    return raw_path
+@pytest.fixture(scope="session")
+def template_zip_bytes(temp_template_zip_cutout_with_rules):
+    """模板 zip 的内容（会话内只读取一次）"""
+    return temp_template_zip_cutout_with_rules.read_bytes()
+
+
+@pytest.fixture(scope="session")
+def template_checksum(template_zip_bytes):
+    """模板 zip 的 SHA-256（会话内只计算一次）"""
+    return hashlib.sha256(template_zip_bytes).hexdigest()
 
 
 @pytest.fixture
-def mock_template_server_cutout_with_rules(temp_template_zip_cutout_with_rules, monkeypatch):
-    """模拟模板下载服务器"""
-    import requests
-    
+def mock_template_server_cutout_with_rules(template_zip_bytes, monkeypatch):
+    """模拟模板下载服务器（返回会话内缓存的 zip 内容）"""
     def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        with open(temp_template_zip_cutout_with_rules, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
+        return MockResponse(template_zip_bytes)
     
     monkeypatch.setattr(requests, "get", mock_get)
 
 
+@pytest.fixture
+def uncached_platform_client(app, monkeypatch):
+    """
+    替换 app.state 上共享的 PlatformClient 为不带缓存的新实例（避免用例之间共享 resolve 结果），用例结束后关闭
+    """
+    with PlatformClient(ttl_seconds=0) as platform_client:
+        monkeypatch.setattr(app.state, "platform_client", platform_client)
+        yield platform_client
+
+
+@pytest.fixture
+def platform_resolve_route(uncached_platform_client, respx_mock):
+    """
+    Platform resolve 接口的 respx 路由（在 transport 层拦截，PlatformClient 走真实的请求/解析逻辑）
+    """
+    resolve_url = f"{settings.PLATFORM_BASE_URL.rstrip('/')}/api/v1/ai/resolve"
+    return respx_mock.post(resolve_url)
+
+
+@pytest.fixture
+def stub_segmentation(monkeypatch):
+    """
+    抠图直接返回 RGBA 原图：这里只验证 platform resolve 的集成，不走 third-party / rembg
+    （否则 rembg 降级会下载 u2net 模型）
+    """
+    def mock_segment(self, raw_image, **kwargs):
+        return raw_image.convert("RGBA"), []
+    
+    monkeypatch.setattr(SegmentationService, "segment", mock_segment)
+
+
 def test_platform_resolve_success(
-    client, temp_template_dir_cutout_with_rules, temp_template_zip_cutout_with_rules,
-    temp_raw_image, mock_template_server_cutout_with_rules, monkeypatch
+    client, temp_template_dir_cutout_with_rules, template_checksum,
+    temp_raw_image, mock_template_server_cutout_with_rules, platform_resolve_route,
+    stub_segmentation, monkeypatch
 ):
     """
     测试 platform resolve 成功
@@ -142,36 +198,24 @@ def test_platform_resolve_success(
     - notes 有 SEG_RESOLVED_PROVIDER
     - 流程正常完成（ok=true）
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip_cutout_with_rules, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
-    
     # Mock TemplateResolver
     def mock_resolve(self):
         return str(temp_template_dir_cutout_with_rules)
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
-    # Mock PlatformClient.resolve() 成功
-    from app.clients.platform_client import PlatformClient
-    
-    def mock_resolve_success(*args, **kwargs):
-        return {
-            "providerCode": "removebg",
-            "endpoint": "https://api.remove.bg/v1.0/removebg",
-            "timeoutMs": 6000,
-        }
-    
-    monkeypatch.setattr(PlatformClient, "resolve", mock_resolve_success)
+    # Platform resolve 返回成功
+    platform_resolve_route.mock(return_value=httpx.Response(200, json={
+        "providerCode": "removebg",
+        "endpoint": "https://api.remove.bg/v1.0/removebg",
+        "timeoutMs": 6000,
+    }))
     
     payload = {
         "templateCode": "tpl_test",
         "versionSemver": "0.1.0",
         "downloadUrl": "http://example.com/template.zip",
-        "checksumSha256": checksum,
+        "checksumSha256": template_checksum,
         "rawPath": str(temp_raw_image)
     }
     
@@ -197,8 +241,9 @@ def test_platform_resolve_success(
 
 
 def test_platform_resolve_failed(
-    client, temp_template_dir_cutout_with_rules, temp_template_zip_cutout_with_rules,
-    temp_raw_image, mock_template_server_cutout_with_rules, monkeypatch
+    client, temp_template_dir_cutout_with_rules, template_checksum,
+    temp_raw_image, mock_template_server_cutout_with_rules, platform_resolve_route,
+    stub_segmentation, monkeypatch
 ):
     """
     测试 platform resolve 失败（platform 停掉）
@@ -208,31 +253,20 @@ def test_platform_resolve_failed(
     - notes 有 SEG_RESOLVE_FAILED
     - 流程仍能完成（ok=true，不崩溃）
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    from app.clients.platform_client import PlatformClient, PlatformResolveError
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip_cutout_with_rules, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
-    
     # Mock TemplateResolver
     def mock_resolve(self):
         return str(temp_template_dir_cutout_with_rules)
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
-    # Mock PlatformClient.resolve() 失败
-    def mock_resolve_failed(*args, **kwargs):
-        raise PlatformResolveError("Platform resolve API call failed: Connection refused")
-    
-    monkeypatch.setattr(PlatformClient, "resolve", mock_resolve_failed)
+    # Platform 停掉：连接被拒绝
+    platform_resolve_route.mock(side_effect=httpx.ConnectError("Connection refused"))
     
     payload = {
         "templateCode": "tpl_test",
         "versionSemver": "0.1.0",
         "downloadUrl": "http://example.com/template.zip",
-        "checksumSha256": checksum,
+        "checksumSha256": template_checksum,
         "rawPath": str(temp_raw_image)
     }
     
@@ -257,9 +291,10 @@ def test_platform_resolve_failed(
     assert "SEG_RESOLVED_PROVIDER" not in notes
 
 
+@pytest.mark.respx(assert_all_called=False)
 def test_platform_resolve_not_called_when_not_needed(
-    client, temp_template_dir_cutout_with_rules, temp_template_zip_cutout_with_rules,
-    temp_raw_image, mock_template_server_cutout_with_rules, monkeypatch
+    client, temp_template_dir_cutout_rules_disabled, template_checksum,
+    temp_raw_image, mock_template_server_cutout_with_rules, platform_resolve_route, monkeypatch
 ):
     """
     测试 needs_segmentation=false 时不调用 resolve
@@ -269,46 +304,20 @@ def test_platform_resolve_not_called_when_not_needed(
     - 不调用 PlatformClient.resolve()
     - notes 没有 SEG_RESOLVED_PROVIDER 和 SEG_RESOLVE_FAILED
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    from app.clients.platform_client import PlatformClient
-    
-    # 修改 rules.json，设置 enabled=false
-    rules = {
-        "segmentation": {
-            "enabled": False,  # 禁用
-            "prefer": ["removebg"],
-            "timeoutMs": 6000,
-        }
-    }
-    (temp_template_dir_cutout_with_rules / "rules.json").write_text(
-        json.dumps(rules, indent=2), encoding="utf-8"
-    )
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip_cutout_with_rules, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
-    
-    # Mock TemplateResolver
+    # Mock TemplateResolver（返回 rules.enabled=false 的模板副本）
     def mock_resolve(self):
-        return str(temp_template_dir_cutout_with_rules)
+        return str(temp_template_dir_cutout_rules_disabled)
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
-    # Mock PlatformClient.resolve() - 如果被调用，测试会失败
-    resolve_called = []
-    
-    def mock_resolve_track(*args, **kwargs):
-        resolve_called.append(True)
-        return {"providerCode": "removebg"}
-    
-    monkeypatch.setattr(PlatformClient, "resolve", mock_resolve_track)
+    # Platform resolve 路由：如果被调用，下面的断言会失败
+    platform_resolve_route.mock(return_value=httpx.Response(200, json={"providerCode": "removebg"}))
     
     payload = {
         "templateCode": "tpl_test",
         "versionSemver": "0.1.0",
         "downloadUrl": "http://example.com/template.zip",
-        "checksumSha256": checksum,
+        "checksumSha256": template_checksum,
         "rawPath": str(temp_raw_image)
     }
     
@@ -328,6 +337,6 @@ def test_platform_resolve_not_called_when_not_needed(
     assert notes["NEEDS_SEGMENTATION"]["details"]["value"] is False
     
     # 断言 resolve 没有被调用
-    assert len(resolve_called) == 0
+    assert not platform_resolve_route.called
     assert "SEG_RESOLVED_PROVIDER" not in notes
     assert "SEG_RESOLVE_FAILED" not in notes
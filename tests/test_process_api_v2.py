@@ -7,71 +7,98 @@
 3. bg 缺失：背景文件缺失
 """
 
+import hashlib
 import json
-import tempfile
+import shutil
 import zipfile
 from pathlib import Path
-from PIL import Image
 import pytest
-from fastapi.testclient import TestClient
+import requests
 
+from app.config import settings
+from app.services.render_engine import RenderEngine, RenderError
+from app.services.template_resolver import TemplateResolver
 
-@pytest.fixture
-def temp_template_dir():
-    """创建临时模板目录，包含完整的模板结构"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        template_dir = Path(tmpdir)
-        
-        # 创建 manifest.json
-        manifest = {
-            "manifestVersion": 1,
-            "templateCode": "tpl_test",
-            "versionSemver": "0.1.0",
-            "output": {
-                "width": 1024,
-                "height": 1024,
-                "format": "png"
-            },
-            "assets": {
-                "basePath": "assets"
-            },
-            "compose": {
-                "background": "bg.png",
-                "photos": [
-                    {
-                        "id": "p1",
-                        "source": "raw",
-                        "x": 100,
-                        "y": 100,
-                        "w": 800,
-                        "h": 800,
-                        "fit": "cover",
-                        "z": 0
-                    }
-                ],
-                "stickers": []
-            }
+
+class MockResponse:
+    """模拟 requests.get 的返回（模块级定义，避免每次请求重新创建类）"""
+    def __init__(self, content=b"", status_code=200):
+        self.content = content
+        self.status_code = status_code
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+    
+    def iter_content(self, chunk_size=8192):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+@pytest.fixture(scope="session")
+def temp_template_dir(bg_png_bytes, tmp_path_factory):
+    """创建临时模板目录，包含完整的模板结构（整个会话共享，测试中不得修改）"""
+    template_dir = tmp_path_factory.mktemp("template")
+    
+    # 创建 manifest.json
+    manifest = {
+        "manifestVersion": 1,
+        "templateCode": "tpl_test",
+        "versionSemver": "0.1.0",
+        "output": {
+            "width": 1024,
+            "height": 1024,
+            "format": "png"
+        },
+        "assets": {
+            "basePath": "assets"
+        },
+        "compose": {
+            "background": "bg.png",
+            "photos": [
+                {
+                    "id": "p1",
+                    "source": "raw",
+                    "x": 100,
+                    "y": 100,
+                    "w": 800,
+                    "h": 800,
+                    "fit": "cover",
+                    "z": 0
+                }
+            ],
+            "stickers": []
         }
-        
-        (template_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
-        
-        # 创建 assets 目录和背景图
-        assets_dir = template_dir / "assets"
-        assets_dir.mkdir()
-        
-        # 创建背景图（纯绿色）
-        bg_image = Image.new("RGB", (1024, 1024), color=(0, 255, 0))
-        bg_image.save(assets_dir / "bg.png", format="PNG")
-        
-        yield template_dir
+    }
+    
+    (template_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    
+    # 创建 assets 目录和背景图
+    assets_dir = template_dir / "assets"
+    assets_dir.mkdir()
+    
+    # 写入背景图（纯绿色，会话内预编码的 PNG 字节）
+    (assets_dir / "bg.png").write_bytes(bg_png_bytes)
+    
+    return template_dir
 
 
 @pytest.fixture
-def temp_template_zip(temp_template_dir, tmp_path):
+def temp_template_dir_no_bg(temp_template_dir, tmp_path):
+    """复制会话模板目录并删除背景文件（供 bg 缺失用例修改，不影响共享目录）"""
+    template_dir = tmp_path / "template"
+    shutil.copytree(temp_template_dir, template_dir)
+    (template_dir / "assets" / "bg.png").unlink()
+    return template_dir
+
+
+@pytest.fixture(scope="session")
+def temp_template_zip(temp_template_dir, tmp_path_factory):
     """创建模板 zip 文件"""
-    zip_path = tmp_path / "template.zip"
+    zip_path = tmp_path_factory.mktemp("template_zip") / "template.zip"
     
-    with zipfile.ZipFile(zip_path, "w") as zipf:
+    # 模板内容是已压缩的 PNG 和很小的 JSON，用 ZIP_STORED 直接存储
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zipf:
         for file_path in temp_template_dir.rglob("*"):
             if file_path.is_file():
                 arcname = file_path.relative_to(temp_template_dir)
@@ -80,43 +107,36 @@ def temp_template_zip(temp_template_dir, tmp_path):
     return zip_path
 
 
+@pytest.fixture(scope="session")
+def template_zip_bytes(temp_template_zip):
+    """模板 zip 的内容（会话内只读取一次）"""
+    return temp_template_zip.read_bytes()
+
+
+@pytest.fixture(scope="session")
+def template_checksum(template_zip_bytes):
+    """模板 zip 的 SHA-256（会话内只计算一次）"""
+    return hashlib.sha256(template_zip_bytes).hexdigest()
+
+
 @pytest.fixture
-def temp_raw_image(tmp_path):
-    """创建临时原始图像"""
-    raw_path = tmp_path / "raw.jpg"
-    img = Image.new("RGB", (800, 1200), color=(255, 0, 0))  # 红色
-    img.save(raw_path, format="JPEG")
-    return raw_path
+def isolated_template_cache(tmp_path, monkeypatch):
+    """把模板缓存目录指向本测试的 tmp_path（并行 worker 之间不共享 app/data/_templates）"""
+    cache_dir = tmp_path / "_templates"
+    monkeypatch.setattr(settings, "TEMPLATE_CACHE_DIR", str(cache_dir))
+    return cache_dir
 
 
 @pytest.fixture
-def mock_template_server(temp_template_zip, monkeypatch):
-    """模拟模板下载服务器"""
-    import requests
-    
+def mock_template_server(template_zip_bytes, monkeypatch):
+    """模拟模板下载服务器（返回会话内缓存的 zip 内容）"""
     def mock_get(url, **kwargs):
-        class MockResponse:
-            def __init__(self, content):
-                self.content = content
-                self.status_code = 200
-            
-            def raise_for_status(self):
-                pass
-            
-            def iter_content(self, chunk_size=8192):
-                for i in range(0, len(self.content), chunk_size):
-                    yield self.content[i:i + chunk_size]
-        
-        # 读取 zip 文件内容
-        with open(temp_template_zip, "rb") as f:
-            content = f.read()
-        
-        return MockResponse(content)
+        return MockResponse(template_zip_bytes)
     
     monkeypatch.setattr(requests, "get", mock_get)
 
 
-def test_process_v2_success(client, temp_template_dir, temp_template_zip, temp_raw_image, mock_template_server, monkeypatch):
+def test_process_v2_success(client, temp_template_dir, template_checksum, temp_raw_image, mock_template_server, monkeypatch):
     """
     测试成功处理流程
     
@@ -125,13 +145,6 @@ def test_process_v2_success(client, temp_template_dir, temp_template_zip, temp_r
     - preview/final url 存在
     - notes 至少有 PREVIEW_EQUALS_FINAL
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 计算 zip 文件的 checksum
-    with open(temp_template_zip, "rb") as f:
-        checksum = hashlib.sha256(f.read()).hexdigest()
-    
     # Mock TemplateResolver.resolve() 方法，直接返回模板目录
     original_resolve = TemplateResolver.resolve
     
@@ -149,7 +162,7 @@ def test_process_v2_success(client, temp_template_dir, temp_template_zip, temp_r
         "templateCode": "tpl_test",
         "versionSemver": "0.1.0",
         "downloadUrl": "http://example.com/template.zip",
-        "checksumSha256": checksum,
+        "checksumSha256": template_checksum,
         "rawPath": str(temp_raw_image)
     }
     
@@ -171,11 +184,11 @@ def test_process_v2_success(client, temp_template_dir, temp_template_zip, temp_r
     
     # 断言 notes 包含 PREVIEW_EQUALS_FINAL
     assert "notes" in data, "Response should contain notes"
-    note_codes = [note["code"] for note in data["notes"]]
+    note_codes = {note["code"] for note in data["notes"]}
     assert "PREVIEW_EQUALS_FINAL" in note_codes, f"Expected PREVIEW_EQUALS_FINAL in notes, got {note_codes}"
 
 
-def test_process_v2_checksum_mismatch(client, temp_template_dir, temp_template_zip, temp_raw_image, mock_template_server, monkeypatch):
+def test_process_v2_checksum_mismatch(client, temp_template_dir, temp_template_zip, temp_raw_image, mock_template_server, isolated_template_cache, monkeypatch):
     """
     测试校验和不匹配
     
@@ -185,13 +198,6 @@ def test_process_v2_checksum_mismatch(client, temp_template_dir, temp_template_z
     - error.retryable=false
     - error.detail 包含 expected/actual
     """
-    import hashlib
-    from app.services.template_resolver import TemplateResolver
-    
-    # 计算正确的 checksum
-    with open(temp_template_zip, "rb") as f:
-        correct_checksum = hashlib.sha256(f.read()).hexdigest()
-    
     # 使用错误的 checksum
     wrong_checksum = "wrong_checksum_" + "0" * 48
     
@@ -221,7 +227,7 @@ def test_process_v2_checksum_mismatch(client, temp_template_dir, temp_template_z
     # actual 应该是计算出的正确 checksum（如果能够提取的话）
 
 
-def test_process_v2_bg_missing(client, temp_template_dir, temp_raw_image, monkeypatch):
+def test_process_v2_bg_missing(client, temp_template_dir_no_bg, temp_raw_image, monkeypatch):
     """
     测试背景文件缺失
     
@@ -229,17 +235,9 @@ def test_process_v2_bg_missing(client, temp_template_dir, temp_raw_image, monkey
     - ok=false
     - error.code 为 ASSET_NOT_FOUND
     """
-    from app.services.template_resolver import TemplateResolver
-    from app.services.manifest_loader import ManifestLoader
-    
-    # 删除背景文件
-    bg_path = temp_template_dir / "assets" / "bg.png"
-    if bg_path.exists():
-        bg_path.unlink()
-    
-    # Mock TemplateResolver
+    # Mock TemplateResolver（返回已删除背景文件的模板副本）
     def mock_resolve(self):
-        return str(temp_template_dir)
+        return str(temp_template_dir_no_bg)
     
     monkeypatch.setattr(TemplateResolver, "resolve", mock_resolve)
     
@@ -265,7 +263,7 @@ def test_process_v2_bg_missing(client, temp_template_dir, temp_raw_image, monkey
     assert data["error"].get("retryable") is False, "retryable should be False for asset not found"
 
 
-def test_process_v2_download_failed(client, temp_raw_image, monkeypatch):
+def test_process_v2_download_failed(client, temp_raw_image, isolated_template_cache, monkeypatch):
     """
     测试模板下载失败
     
@@ -274,19 +272,8 @@ def test_process_v2_download_failed(client, temp_raw_image, monkeypatch):
     - error.code 为 TEMPLATE_DOWNLOAD_FAILED
     - error.retryable=true
     """
-    import requests
-    
     def mock_get_failed(url, **kwargs):
-        class MockResponse:
-            status_code = 404
-            
-            def raise_for_status(self):
-                raise requests.HTTPError("404 Not Found")
-            
-            def iter_content(self, chunk_size=8192):
-                return iter([])
-        
-        return MockResponse()
+        return MockResponse(status_code=404)
     
     monkeypatch.setattr(requests, "get", mock_get_failed)
     
@@ -321,9 +308,6 @@ def test_process_v2_render_failed(client, temp_template_dir, temp_raw_image, mon
     - error.code 为 RENDER_FAILED
     - error.retryable=false
     """
-    from app.services.template_resolver import TemplateResolver
-    from app.services.render_engine import RenderEngine, RenderError
-    
     # Mock TemplateResolver
     def mock_resolve(self):
         return str(temp_template_dir)
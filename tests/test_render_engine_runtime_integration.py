@@ -9,9 +9,9 @@ RenderEngine + ManifestLoader 集成测试（不依赖网络、不依赖真实
 """
 
 import json
-import tempfile
 from pathlib import Path
 
+import numpy as np
 import pytest
 from PIL import Image
 
@@ -30,17 +30,17 @@ def _create_template_and_runtime_spec(
 
     目录结构：
     {tmpdir}/manifest.json
-    {tmpdir}/assets/bg.png       纯绿色 1024x1024
-    {tmpdir}/assets/sticker.png  纯蓝色 200x200（可选）
+    {tmpdir}/assets/bg.png       纯绿色 256x256
+    {tmpdir}/assets/sticker.png  纯蓝色 50x50（可选）
     """
     template_dir = tmpdir
     assets_dir = template_dir / "assets"
     assets_dir.mkdir(parents=True, exist_ok=True)
 
     # 背景：纯绿色，方便断言
-    bg_img = Image.new("RGB", (1024, 1024), color=(0, 255, 0))
+    bg_img = Image.new("RGB", (256, 256), color=(0, 255, 0))
     bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    bg_img.save(bg_path, format="PNG", compress_level=1)  # 测试不关心文件大小，用最快的压缩级别
 
     manifest_compose = {
         "background": "bg.png",
@@ -48,10 +48,10 @@ def _create_template_and_runtime_spec(
             {
                 "id": "p1",
                 "source": "raw",
-                "x": 100,
-                "y": 100,
-                "w": 400,
-                "h": 400,
+                "x": 25,
+                "y": 25,
+                "w": 100,
+                "h": 100,
                 "fit": "cover",
                 "z": 10,
             }
@@ -60,15 +60,15 @@ def _create_template_and_runtime_spec(
 
     if with_sticker:
         # 贴图：纯蓝色
-        sticker_img = Image.new("RGBA", (200, 200), color=(0, 0, 255, 255))
+        sticker_img = Image.new("RGBA", (50, 50), color=(0, 0, 255, 255))
         sticker_path = assets_dir / "sticker.png"
-        sticker_img.save(sticker_path)
+        sticker_img.save(sticker_path, format="PNG", compress_level=1)
 
         # 默认放在照片区域之上，且 z 更大
         if sticker_over_photo:
-            sticker_x, sticker_y = 150, 150  # 与 photo 有重叠
+            sticker_x, sticker_y = 37, 37  # 与 photo 有重叠
         else:
-            sticker_x, sticker_y = 600, 600  # 放在角落，不影响 photo 测试
+            sticker_x, sticker_y = 150, 150  # 放在角落，不影响 photo 测试
 
         manifest_compose["stickers"] = [
             {
@@ -76,8 +76,8 @@ def _create_template_and_runtime_spec(
                 "src": "sticker.png",
                 "x": sticker_x,
                 "y": sticker_y,
-                "w": 200,
-                "h": 200,
+                "w": 50,
+                "h": 50,
                 "rotate": 0,
                 "opacity": 1.0,
                 "z": 20,
@@ -91,8 +91,8 @@ def _create_template_and_runtime_spec(
         "templateCode": "tpl_render_test",
         "versionSemver": "0.1.0",
         "output": {
-            "width": 1024,
-            "height": 1024,
+            "width": 256,
+            "height": 256,
             "format": "png",
         },
         "assets": {
@@ -116,79 +116,84 @@ def _create_template_and_runtime_spec(
 
 
 def _color_close(rgb, expected, tol=10):
-    return all(abs(int(c) - int(e)) <= tol for c, e in zip(rgb, expected))
+    diff = np.abs(np.asarray(rgb, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+    return bool(diff.max() <= tol)
 
 
-def test_render_output_size_correct():
+def _region_close(img, box, expected, tol=10):
+    """box 区域内所有像素的 RGB 都接近 expected"""
+    arr = np.asarray(img.crop(box))[..., :3].astype(np.int16)
+    return bool(np.abs(arr - np.asarray(expected, dtype=np.int16)).max() <= tol)
+
+
+def test_render_output_size_correct(tmp_path):
     """输出尺寸应与 manifest.output 一致"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        runtime_spec = _create_template_and_runtime_spec(Path(tmpdir))
+    runtime_spec = _create_template_and_runtime_spec(tmp_path)
 
-        # raw：纯红色
-        raw_image = Image.new("RGB", (800, 1200), color=(255, 0, 0))
+    # raw：纯红色
+    raw_image = Image.new("RGB", (200, 300), color=(255, 0, 0))
 
-        engine = RenderEngine(runtime_spec)
-        canvas = engine.render(raw_image)
+    engine = RenderEngine(runtime_spec)
+    canvas = engine.render(raw_image)
 
-        assert canvas.size == (1024, 1024)
+    assert canvas.size == (256, 256)
 
 
-def test_background_is_applied():
+def test_background_is_applied(tmp_path):
     """
     背景为纯绿色，且 (0,0) 不在 photo/sticker 区域，应该看到绿色。
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
-        runtime_spec = _create_template_and_runtime_spec(Path(tmpdir), with_sticker=True)
+    runtime_spec = _create_template_and_runtime_spec(tmp_path, with_sticker=True)
 
-        raw_image = Image.new("RGB", (800, 1200), color=(255, 0, 0))
+    raw_image = Image.new("RGB", (200, 300), color=(255, 0, 0))
 
-        engine = RenderEngine(runtime_spec)
-        canvas = engine.render(raw_image)
+    engine = RenderEngine(runtime_spec)
+    canvas = engine.render(raw_image)
 
-        pixel = canvas.getpixel((0, 0))  # 左上角不会被 photo/sticker 覆盖
-        rgb = pixel[:3]
-        assert _color_close(rgb, (0, 255, 0)), f"背景像素应接近绿色，实际为 {rgb}"
+    pixel = canvas.getpixel((0, 0))  # 左上角不会被 photo/sticker 覆盖
+    rgb = pixel[:3]
+    assert _color_close(rgb, (0, 255, 0)), f"背景像素应接近绿色，实际为 {rgb}"
 
 
-def test_photo_cover_changes_pixels():
+def test_photo_cover_changes_pixels(tmp_path):
     """
     photo 区域中心点应被 raw（纯红）覆盖，而不是绿色背景。
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
-        runtime_spec = _create_template_and_runtime_spec(Path(tmpdir))
+    runtime_spec = _create_template_and_runtime_spec(tmp_path)
 
-        # raw：纯红
-        raw_image = Image.new("RGB", (800, 1200), color=(255, 0, 0))
+    # raw：纯红
+    raw_image = Image.new("RGB", (200, 300), color=(255, 0, 0))
 
-        engine = RenderEngine(runtime_spec)
-        canvas = engine.render(raw_image)
+    engine = RenderEngine(runtime_spec)
+    canvas = engine.render(raw_image)
 
-        # photo 区域：x=100,y=100,w=400,h=400 → 中心大约在 (300,300)
-        pixel = canvas.getpixel((300, 300))
-        rgb = pixel[:3]
-        assert _color_close(rgb, (255, 0, 0)), f"photo 区域应接近红色，实际为 {rgb}"
+    # photo 区域：x=25,y=25,w=100,h=100 → 中心大约在 (75,75)
+    pixel = canvas.getpixel((75, 75))
+    rgb = pixel[:3]
+    assert _color_close(rgb, (255, 0, 0)), f"photo 区域应接近红色，实际为 {rgb}"
+    # 整个 photo 区域（去掉边缘 1px 的缩放插值）都应被 raw 覆盖
+    assert _region_close(canvas, (26, 26, 124, 124), (255, 0, 0)), "photo 区域应整体接近红色"
 
 
-def test_sticker_overlays_photo():
+def test_sticker_overlays_photo(tmp_path):
     """
     贴图为纯蓝色，z 比 photo 大，且与 photo 区域重叠。
     重叠区域应呈现蓝色（或接近蓝色）。
     """
-    with tempfile.TemporaryDirectory() as tmpdir:
-        runtime_spec = _create_template_and_runtime_spec(
-            Path(tmpdir),
-            with_sticker=True,
-            sticker_over_photo=True,
-        )
-
-        raw_image = Image.new("RGB", (800, 1200), color=(255, 0, 0))
-
-        engine = RenderEngine(runtime_spec)
-        canvas = engine.render(raw_image)
-
-        # 选一个同时在 photo 和 sticker 内的点，比如 (200,200)
-        pixel = canvas.getpixel((200, 200))
-        r, g, b, *_ = pixel
-        # 预期蓝色分量最大
-        assert b > r and b > g, f"重叠区域应被蓝色贴图覆盖，实际像素为 {(r, g, b)}"
+    runtime_spec = _create_template_and_runtime_spec(
+        tmp_path,
+        with_sticker=True,
+        sticker_over_photo=True,
+    )
+
+    raw_image = Image.new("RGB", (200, 300), color=(255, 0, 0))
+
+    engine = RenderEngine(runtime_spec)
+    canvas = engine.render(raw_image)
+
+    # 选一个同时在 photo 和 sticker 内的点，比如 (50,50)
+    pixel = canvas.getpixel((50, 50))
+    r, g, b, *_ = pixel
+    # 预期蓝色分量最大
+    assert b > r and b > g, f"重叠区域应被蓝色贴图覆盖，实际像素为 {(r, g, b)}"
 
@@ -7,45 +7,66 @@
 3. fit 模式（cover/contain）
 4. 贴纸的旋转和透明度
 5. 坐标改变导致输出变化
+6. 素材解码缓存
 """
 
+import io
 import pytest
-import tempfile
-from pathlib import Path
+from functools import lru_cache
 from PIL import Image
 
+from app.services import render_engine as render_engine_module
 from app.services.render_engine import RenderEngine, RenderError
 
 
-@pytest.fixture
-def temp_dir():
-    """创建临时目录"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        yield Path(tmpdir)
+# 输出画布尺寸：只需覆盖 z 排序 / fit / 旋转 / 透明度 / 缺失素材等分支，用小画布即可
+OUTPUT_W, OUTPUT_H = 180, 120
 
 
-@pytest.fixture
-def sample_runtime_spec(temp_dir):
-    """创建示例 runtime_spec"""
-    # 创建 assets 目录
-    assets_dir = temp_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
+@lru_cache(maxsize=None)
+def _encode_solid_png(mode, size, color):
+    """纯色图编码为 PNG 字节（相同参数只编码一次；纯色图用 compress_level=1 即可）"""
+    buf = io.BytesIO()
+    Image.new(mode, size, color=color).save(buf, format="PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def _write_solid_png(path, mode, size, color):
+    """把预编码的纯色 PNG 写到 path，返回 path"""
+    path.write_bytes(_encode_solid_png(mode, size, color))
+    return path
+
+
+@pytest.fixture(scope="session")
+def sample_assets_dir(tmp_path_factory):
+    """创建示例素材目录（bg.png + sticker1.png，整个会话只写一次，测试中不得修改）"""
+    assets_dir = tmp_path_factory.mktemp("render_assets")
     
     # 创建背景图片
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    _write_solid_png(assets_dir / "bg.png", "RGB", (OUTPUT_W, OUTPUT_H), (100, 150, 200))
     
     # 创建贴纸图片
-    sticker_img = Image.new("RGBA", (200, 200), color=(255, 0, 0, 200))
-    sticker_path = assets_dir / "sticker1.png"
-    sticker_img.save(sticker_path)
+    _write_solid_png(assets_dir / "sticker1.png", "RGBA", (20, 20), (255, 0, 0, 200))
+    
+    return assets_dir
+
+
+@pytest.fixture
+def sample_runtime_spec(request, sample_assets_dir):
+    """
+    创建示例 runtime_spec（每个测试一份新的 dict，素材文件共享）
+    
+    可通过 indirect 参数化传入照片坐标 (x, y)，默认 (10, 20)。
+    """
+    photo_x, photo_y = getattr(request, "param", (10, 20))
+    bg_path = sample_assets_dir / "bg.png"
+    sticker_path = sample_assets_dir / "sticker1.png"
     
     # 创建 runtime_spec
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
@@ -55,10 +76,10 @@ def sample_runtime_spec(temp_dir):
             {
                 "id": "p1",
                 "source": "raw",
-                "x": 100,
-                "y": 200,
-                "w": 800,
-                "h": 900,
+                "x": photo_x,
+                "y": photo_y,
+                "w": 80,
+                "h": 90,
                 "fit": "cover",
                 "z": 1
             }
@@ -67,10 +88,10 @@ def sample_runtime_spec(temp_dir):
             {
                 "id": "s1",
                 "path": str(sticker_path.resolve()),
-                "x": 50,
-                "y": 50,
-                "w": 100,
-                "h": 100,
+                "x": 5,
+                "y": 5,
+                "w": 10,
+                "h": 10,
                 "rotate": 0,
                 "opacity": 1.0,
                 "z": 2
@@ -84,7 +105,7 @@ def sample_runtime_spec(temp_dir):
 def test_render_basic(sample_runtime_spec):
     """测试基本渲染功能"""
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 0))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 0))
     
     # 创建 RenderEngine
     engine = RenderEngine(sample_runtime_spec)
@@ -93,35 +114,28 @@ def test_render_basic(sample_runtime_spec):
     result = engine.render(raw_image)
     
     # 验证结果
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
     assert result.mode == "RGBA"
 
 
-def test_render_z_order(temp_dir):
+def test_render_z_order(tmp_path):
     """测试 z 排序功能"""
     # 创建 assets 目录
-    assets_dir = temp_dir / "assets"
+    assets_dir = tmp_path / "assets"
     assets_dir.mkdir(parents=True, exist_ok=True)
     
     # 创建背景图片
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 100, 100))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    bg_path = _write_solid_png(assets_dir / "bg.png", "RGB", (OUTPUT_W, OUTPUT_H), (100, 100, 100))
     
     # 创建两个贴纸（不同颜色）
-    sticker1_img = Image.new("RGBA", (200, 200), color=(255, 0, 0, 255))  # 红色
-    sticker1_path = assets_dir / "sticker1.png"
-    sticker1_img.save(sticker1_path)
-    
-    sticker2_img = Image.new("RGBA", (200, 200), color=(0, 255, 0, 255))  # 绿色
-    sticker2_path = assets_dir / "sticker2.png"
-    sticker2_img.save(sticker2_path)
+    sticker1_path = _write_solid_png(assets_dir / "sticker1.png", "RGBA", (20, 20), (255, 0, 0, 255))  # 红色
+    sticker2_path = _write_solid_png(assets_dir / "sticker2.png", "RGBA", (20, 20), (0, 255, 0, 255))  # 绿色
     
     # 创建 runtime_spec（z 值：sticker1(1) < sticker2(2)）
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
@@ -132,10 +146,10 @@ def test_render_z_order(temp_dir):
             {
                 "id": "s2",
                 "path": str(sticker2_path.resolve()),
-                "x": 150,  # 与 s1 重叠
-                "y": 150,
-                "w": 200,
-                "h": 200,
+                "x": 15,  # 与 s1 重叠
+                "y": 15,
+                "w": 20,
+                "h": 20,
                 "rotate": 0,
                 "opacity": 1.0,
                 "z": 2  # z 值更大，应该在上层
@@ -143,10 +157,10 @@ def test_render_z_order(temp_dir):
             {
                 "id": "s1",
                 "path": str(sticker1_path.resolve()),
-                "x": 100,
-                "y": 100,
-                "w": 200,
-                "h": 200,
+                "x": 10,
+                "y": 10,
+                "w": 20,
+                "h": 20,
                 "rotate": 0,
                 "opacity": 1.0,
                 "z": 1
@@ -158,45 +172,40 @@ def test_render_z_order(temp_dir):
     engine = RenderEngine(runtime_spec)
     
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 255))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
     
     # 渲染
     result = engine.render(raw_image)
     
     # 验证：重叠区域应该是绿色（z=2 在上层）
     # 检查重叠区域的像素（应该在绿色贴纸范围内）
-    pixel = result.getpixel((200, 200))
+    pixel = result.getpixel((20, 20))
     # 绿色贴纸在上层，所以应该是绿色（0, 255, 0）
     assert pixel[1] > pixel[0], "绿色贴纸应该在红色贴纸上方（z=2 > z=1）"
 
 
-def test_render_fit_cover(temp_dir):
+def test_render_fit_cover():
     """测试 fit=cover 模式"""
-    # 创建 runtime_spec
-    assets_dir = temp_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    # 背景直接传已解码的图片，不落盘
+    bg_img = Image.new("RGB", (OUTPUT_W, OUTPUT_H), color=(100, 150, 200))
     
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
-            "path": str(bg_path.resolve())
+            "image": bg_img
         },
         "photos": [
             {
                 "id": "p1",
                 "source": "raw",
-                "x": 100,
-                "y": 200,
-                "w": 400,
-                "h": 400,
+                "x": 10,
+                "y": 20,
+                "w": 40,
+                "h": 40,
                 "fit": "cover",
                 "z": 1
             }
@@ -205,7 +214,7 @@ def test_render_fit_cover(temp_dir):
     }
     
     # 创建测试用的 raw_image（宽高比与目标区域不同）
-    raw_image = Image.new("RGB", (1000, 500), color=(255, 0, 255))  # 宽高比 2:1
+    raw_image = Image.new("RGB", (100, 50), color=(255, 0, 255))  # 宽高比 2:1
     
     # 创建 RenderEngine
     engine = RenderEngine(runtime_spec)
@@ -214,36 +223,31 @@ def test_render_fit_cover(temp_dir):
     result = engine.render(raw_image)
     
     # 验证：cover 模式应该填满目标区域
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
 
 
-def test_render_fit_contain(temp_dir):
+def test_render_fit_contain():
     """测试 fit=contain 模式"""
-    # 创建 runtime_spec
-    assets_dir = temp_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    # 背景直接传已解码的图片，不落盘
+    bg_img = Image.new("RGB", (OUTPUT_W, OUTPUT_H), color=(100, 150, 200))
     
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
-            "path": str(bg_path.resolve())
+            "image": bg_img
         },
         "photos": [
             {
                 "id": "p1",
                 "source": "raw",
-                "x": 100,
-                "y": 200,
-                "w": 400,
-                "h": 400,
+                "x": 10,
+                "y": 20,
+                "w": 40,
+                "h": 40,
                 "fit": "contain",
                 "z": 1
             }
@@ -252,7 +256,7 @@ def test_render_fit_contain(temp_dir):
     }
     
     # 创建测试用的 raw_image（宽高比与目标区域不同）
-    raw_image = Image.new("RGB", (1000, 500), color=(255, 0, 255))  # 宽高比 2:1
+    raw_image = Image.new("RGB", (100, 50), color=(255, 0, 255))  # 宽高比 2:1
     
     # 创建 RenderEngine
     engine = RenderEngine(runtime_spec)
@@ -261,41 +265,34 @@ def test_render_fit_contain(temp_dir):
     result = engine.render(raw_image)
     
     # 验证：contain 模式应该完整显示图像
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
 
 
-def test_render_sticker_rotate(temp_dir):
+@pytest.mark.slow
+def test_render_sticker_rotate():
     """测试贴纸旋转"""
-    # 创建 runtime_spec
-    assets_dir = temp_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
-    
-    sticker_img = Image.new("RGBA", (200, 200), color=(255, 0, 0, 255))
-    sticker_path = assets_dir / "sticker1.png"
-    sticker_img.save(sticker_path)
+    # 背景和贴纸直接传已解码的图片，不落盘
+    bg_img = Image.new("RGB", (OUTPUT_W, OUTPUT_H), color=(100, 150, 200))
+    sticker_img = Image.new("RGBA", (20, 20), color=(255, 0, 0, 255))
     
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
-            "path": str(bg_path.resolve())
+            "image": bg_img
         },
         "photos": [],
         "stickers": [
             {
                 "id": "s1",
-                "path": str(sticker_path.resolve()),
-                "x": 100,
-                "y": 100,
-                "w": 200,
-                "h": 200,
+                "image": sticker_img,
+                "x": 10,
+                "y": 10,
+                "w": 20,
+                "h": 20,
                 "rotate": 45,  # 旋转 45 度
                 "opacity": 1.0,
                 "z": 1
@@ -307,47 +304,40 @@ def test_render_sticker_rotate(temp_dir):
     engine = RenderEngine(runtime_spec)
     
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 255))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
     
     # 渲染
     result = engine.render(raw_image)
     
     # 验证：旋转后的贴纸应该存在
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
 
 
-def test_render_sticker_opacity(temp_dir):
+@pytest.mark.slow
+def test_render_sticker_opacity():
     """测试贴纸透明度"""
-    # 创建 runtime_spec
-    assets_dir = temp_dir / "assets"
-    assets_dir.mkdir(parents=True, exist_ok=True)
-    
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
-    
-    sticker_img = Image.new("RGBA", (200, 200), color=(255, 0, 0, 255))
-    sticker_path = assets_dir / "sticker1.png"
-    sticker_img.save(sticker_path)
+    # 背景和贴纸直接传已解码的图片，不落盘
+    bg_img = Image.new("RGB", (OUTPUT_W, OUTPUT_H), color=(100, 150, 200))
+    sticker_img = Image.new("RGBA", (20, 20), color=(255, 0, 0, 255))
     
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
-            "path": str(bg_path.resolve())
+            "image": bg_img
         },
         "photos": [],
         "stickers": [
             {
                 "id": "s1",
-                "path": str(sticker_path.resolve()),
-                "x": 100,
-                "y": 100,
-                "w": 200,
-                "h": 200,
+                "image": sticker_img,
+                "x": 10,
+                "y": 10,
+                "w": 20,
+                "h": 20,
                 "rotate": 0,
                 "opacity": 0.5,  # 50% 透明度
                 "z": 1
@@ -359,15 +349,15 @@ def test_render_sticker_opacity(temp_dir):
     engine = RenderEngine(runtime_spec)
     
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 255))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
     
     # 渲染
     result = engine.render(raw_image)
     
     # 验证：透明度应该生效
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
     # 由于背景是完全不透明，合成后 alpha 仍为 255，这里通过颜色“变浅”来判断透明度是否生效
-    pixel = result.getpixel((200, 200))
+    pixel = result.getpixel((20, 20))
     r, g, b, a = pixel
     assert a == 255, "合成后整体 alpha 仍应为 255"
     # 贴纸是纯红 (255,0,0) 覆盖在蓝灰背景上，半透明后红色分量应 < 255，且仍明显偏红
@@ -375,45 +365,32 @@ def test_render_sticker_opacity(temp_dir):
     assert r > g and r > b, "整体颜色仍应偏红，说明贴纸确实覆盖在背景上"
 
 
+@pytest.mark.parametrize("sample_runtime_spec", [(10, 20), (50, 25)], indirect=True)
 def test_render_coordinate_change(sample_runtime_spec):
-    """测试：改变坐标，输出图像应该变化"""
+    """测试：改变坐标，照片应该出现在新坐标处"""
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 0))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 0))
     
-    # 第一次渲染（原始坐标）
-    engine1 = RenderEngine(sample_runtime_spec)
-    result1 = engine1.render(raw_image)
-    
-    # 修改坐标
-    runtime_spec2 = sample_runtime_spec.copy()
-    runtime_spec2["photos"] = [photo.copy() for photo in sample_runtime_spec["photos"]]
-    runtime_spec2["photos"][0]["x"] = 500
-    runtime_spec2["photos"][0]["y"] = 500
-    
-    # 第二次渲染（修改后的坐标）
-    engine2 = RenderEngine(runtime_spec2)
-    result2 = engine2.render(raw_image)
-    
-    # 验证：两张图像应该不同（通过比较特定位置的像素）
-    # 检查照片区域的像素（应该在第一次渲染的照片范围内）
-    pixel1 = result1.getpixel((500, 500))
-    pixel2 = result2.getpixel((500, 500))
+    engine = RenderEngine(sample_runtime_spec)
+    result = engine.render(raw_image)
     
-    # 如果坐标改变生效，这两个位置的像素应该不同
-    # 注意：由于照片位置改变，原来位置的像素可能不同
-    assert result1.size == result2.size, "尺寸应该相同"
+    # 验证：照片左上角落在 spec 指定的坐标上（黄色照片覆盖蓝灰背景）
+    photo = sample_runtime_spec["photos"][0]
+    assert result.size == (OUTPUT_W, OUTPUT_H), "尺寸应该相同"
+    assert result.getpixel((photo["x"] + 1, photo["y"] + 1))[:3] == (255, 255, 0)
+    assert result.getpixel((photo["x"] - 1, photo["y"] - 1))[:3] != (255, 255, 0)
 
 
-def test_render_missing_background(temp_dir):
+def test_render_missing_background(tmp_path):
     """测试：背景文件不存在时应该正常处理"""
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
-            "path": str(temp_dir / "nonexistent_bg.png")  # 不存在的文件
+            "path": str(tmp_path / "nonexistent_bg.png")  # 不存在的文件
         },
         "photos": [],
         "stickers": []
@@ -423,28 +400,26 @@ def test_render_missing_background(temp_dir):
     engine = RenderEngine(runtime_spec)
     
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 255))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
     
     # 渲染（应该不会报错，只是没有背景）
     result = engine.render(raw_image)
     
     # 验证：应该生成透明背景的画布
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
 
 
-def test_render_missing_sticker(temp_dir):
+def test_render_missing_sticker(tmp_path):
     """测试：贴纸文件不存在时应该正常处理"""
-    assets_dir = temp_dir / "assets"
+    assets_dir = tmp_path / "assets"
     assets_dir.mkdir(parents=True, exist_ok=True)
     
-    bg_img = Image.new("RGB", (1800, 1200), color=(100, 150, 200))
-    bg_path = assets_dir / "bg.png"
-    bg_img.save(bg_path)
+    bg_path = _write_solid_png(assets_dir / "bg.png", "RGB", (OUTPUT_W, OUTPUT_H), (100, 150, 200))
     
     runtime_spec = {
         "output": {
-            "width": 1800,
-            "height": 1200,
+            "width": OUTPUT_W,
+            "height": OUTPUT_H,
             "format": "png"
         },
         "background": {
@@ -454,11 +429,11 @@ def test_render_missing_sticker(temp_dir):
         "stickers": [
             {
                 "id": "s1",
-                "path": str(temp_dir / "nonexistent_sticker.png"),  # 不存在的文件
-                "x": 100,
-                "y": 100,
-                "w": 200,
-                "h": 200,
+                "path": str(tmp_path / "nonexistent_sticker.png"),  # 不存在的文件
+                "x": 10,
+                "y": 10,
+                "w": 20,
+                "h": 20,
                 "rotate": 0,
                 "opacity": 1.0,
                 "z": 1
@@ -470,10 +445,78 @@ def test_render_missing_sticker(temp_dir):
     engine = RenderEngine(runtime_spec)
     
     # 创建测试用的 raw_image
-    raw_image = Image.new("RGB", (1000, 1000), color=(255, 255, 255))
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
     
     # 渲染（应该不会报错，只是没有贴纸）
     result = engine.render(raw_image)
     
     # 验证：应该正常渲染（只是没有贴纸）
-    assert result.size == (1800, 1200)
+    assert result.size == (OUTPUT_W, OUTPUT_H)
+
+
+@pytest.fixture
+def count_asset_decodes(monkeypatch):
+    """统计素材解码次数，并为每个用例换一个空的素材缓存"""
+    decoded = []
+    original_open_image = render_engine_module.open_image
+    
+    def counting_open_image(path):
+        decoded.append(path)
+        return original_open_image(path)
+    
+    monkeypatch.setattr(render_engine_module, "open_image", counting_open_image)
+    monkeypatch.setattr(render_engine_module, "_asset_cache", render_engine_module._AssetCache())
+    return decoded
+
+
+def _background_only_spec(bg_path):
+    """只有背景图层的 runtime_spec"""
+    return {
+        "output": {"width": OUTPUT_W, "height": OUTPUT_H, "format": "png"},
+        "background": {"path": str(bg_path)},
+        "photos": [],
+        "stickers": [],
+    }
+
+
+def test_render_asset_cache_disabled_by_default(tmp_path, count_asset_decodes):
+    """测试：默认不缓存素材，每次渲染都重新解码"""
+    bg_path = _write_solid_png(tmp_path / "bg.png", "RGB", (OUTPUT_W, OUTPUT_H), (100, 150, 200))
+    runtime_spec = _background_only_spec(bg_path)
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
+    
+    RenderEngine(runtime_spec).render(raw_image)
+    RenderEngine(runtime_spec).render(raw_image)
+    assert count_asset_decodes == [str(bg_path)] * 2
+
+
+def test_render_reuses_decoded_assets(tmp_path, count_asset_decodes, monkeypatch):
+    """测试：开启缓存后同一素材文件多次渲染只解码一次，文件改写后重新解码"""
+    monkeypatch.setattr(render_engine_module.settings, "RENDER_ASSET_CACHE_MB", 16)
+    
+    bg_path = _write_solid_png(tmp_path / "bg.png", "RGB", (OUTPUT_W, OUTPUT_H), (100, 150, 200))
+    runtime_spec = _background_only_spec(bg_path)
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
+    
+    RenderEngine(runtime_spec).render(raw_image)
+    RenderEngine(runtime_spec).render(raw_image)
+    assert count_asset_decodes == [str(bg_path)]
+    
+    # 改写背景文件（文件大小变化，即使 mtime 没变也能识别）后应重新解码，并渲染出新颜色
+    _write_solid_png(bg_path, "RGB", (OUTPUT_W // 2, OUTPUT_H // 2), (0, 0, 0))
+    result = RenderEngine(runtime_spec).render(raw_image)
+    assert len(count_asset_decodes) == 2
+    assert result.getpixel((0, 0))[:3] == (0, 0, 0)
+
+
+def test_render_asset_cache_skips_oversized_images(tmp_path, count_asset_decodes, monkeypatch):
+    """测试：超过缓存上限的素材不缓存"""
+    monkeypatch.setattr(render_engine_module.settings, "RENDER_ASSET_CACHE_MB", 1)
+    
+    bg_path = _write_solid_png(tmp_path / "bg.png", "RGB", (1024, 1024), (100, 150, 200))
+    runtime_spec = _background_only_spec(bg_path)
+    raw_image = Image.new("RGB", (100, 100), color=(255, 255, 255))
+    
+    RenderEngine(runtime_spec).render(raw_image)
+    RenderEngine(runtime_spec).render(raw_image)
+    assert len(count_asset_decodes) == 2
@@ -1,41 +1,57 @@
 """
 测试 SegmentationService 的降级逻辑
 
-测试场景：
+测试场景（参数化为 test_segmentation）：
 1. removebg 正常：notes 有 seg.provider=third_party
 2. removebg endpoint 错误：notes 有 seg.fallback=rembg
 3. rembg 禁用/异常：notes 有 seg.fallback=raw，仍能出图
+4. removebg 结果质量检查失败：notes 有 seg.fallback=rembg
 """
 
 import io
+import numpy as np
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import DEFAULT, Mock, patch
 from PIL import Image
 from app.services.segmentation.segmentation_service import SegmentationService
 from app.services.segmentation.third_party_provider import SegmentationProviderError
-from app.clients.platform_client import PlatformResolveError
+from app.clients.platform_client import PlatformClient, PlatformResolveError
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def sample_image():
-    """创建测试图片"""
+    """创建测试图片（模块内共享，测试中只读）"""
     img = Image.new("RGB", (800, 1200), color=(255, 0, 0))
     return img
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def rgba_result_image():
-    """创建 RGBA 结果图片（模拟 remove.bg 返回）"""
-    img = Image.new("RGBA", (800, 1200), color=(255, 0, 0, 255))
-    # 添加一些透明区域（但主体区域足够大）
-    pixels = img.load()
-    # 中间区域不透明（主体）
-    for x in range(200, 600):
-        for y in range(200, 1000):
-            pixels[x, y] = (255, 0, 0, 255)
+    """创建 RGBA 结果图片（模拟 remove.bg 返回；模块内共享，测试中只读）"""
+    # 四周透明，中间区域不透明（主体区域足够大）
+    img = Image.new("RGBA", (800, 1200), color=(0, 0, 0, 0))
+    img.paste((255, 0, 0, 255), (200, 200, 600, 1000))
     return img
 
 
+# 平台 resolve 返回的执行计划（各测试共用，只读）
+EXECUTION_PLAN = {
+    "providerCode": "removebg",
+    "endpoint": "https://api.remove.bg/v1.0/removebg",
+    "auth": {"apiKey": "test_key"},
+    "timeoutMs": 6000,
+    "params": {},
+}
+
+
+@pytest.fixture(scope="module")
+def low_quality_image():
+    """创建质量很差的 RGBA 图片（几乎全透明，只有左上角 10x10 的主体区域；模块内共享，测试中只读）"""
+    pixels = np.zeros((1200, 800, 4), dtype=np.uint8)
+    pixels[0:10, 0:10] = (255, 0, 0, 255)
+    return Image.fromarray(pixels, "RGBA")
+
+
 @pytest.fixture
 def rules():
     """创建规则配置"""
@@ -51,216 +67,133 @@ def rules():
     }
 
 
-def test_segmentation_third_party_success(sample_image, rgba_result_image, rules):
-    """测试 third-party 成功场景"""
-    # Mock platform resolve
-    execution_plan = {
-        "providerCode": "removebg",
-        "endpoint": "https://api.remove.bg/v1.0/removebg",
-        "auth": {"apiKey": "test_key"},
-        "timeoutMs": 6000,
-        "params": {},
-    }
+@pytest.fixture
+def seg_mocks():
+    """
+    替换 SegmentationService 依赖的 PlatformClient / ThirdPartySegmentationProvider / SegmentService
     
-    # Mock platform client 和 third-party provider
-    with patch('app.services.segmentation.segmentation_service.PlatformClient') as MockPlatformClient, \
-         patch('app.services.segmentation.segmentation_service.ThirdPartySegmentationProvider') as MockThirdPartyProvider:
-        
-        mock_platform = MagicMock()
-        mock_platform.resolve.return_value = execution_plan
-        MockPlatformClient.return_value = mock_platform
-        
-        mock_provider = MagicMock()
-        mock_provider.process.return_value = rgba_result_image
-        MockThirdPartyProvider.return_value = mock_provider
-        
-        service = SegmentationService()
-        cutout, notes = service.segment(
-            raw_image=sample_image,
-            template_code="tpl_001",
-            version_semver="0.1.0",
-            rules=rules,
-        )
-        
-        # 验证结果
-        assert cutout is not None
-        assert cutout.mode == "RGBA"
-        
-        # 验证 notes
-        note_codes = [n["code"] for n in notes]
-        assert "seg.provider" in note_codes
-        provider_note = next(n for n in notes if n["code"] == "seg.provider")
-        assert provider_note["details"]["provider"] == "removebg"
-
-
-def test_segmentation_fallback_to_rembg(sample_image, rules):
-    """测试 third-party 失败，降级到 rembg"""
-    # Mock platform resolve 成功
-    execution_plan = {
-        "providerCode": "removebg",
-        "endpoint": "https://api.remove.bg/v1.0/removebg",
-        "auth": {"apiKey": "test_key"},
-        "timeoutMs": 6000,
-        "params": {},
-    }
+    返回 (mock_platform, mock_provider, mock_rembg_service)；platform resolve 默认返回 EXECUTION_PLAN，
+    测试只需设置 provider.process 和 rembg segment_auto 的行为。
     
-    # Mock platform client 和 third-party provider
-    with patch('app.services.segmentation.segmentation_service.PlatformClient') as MockPlatformClient, \
-         patch('app.services.segmentation.segmentation_service.ThirdPartySegmentationProvider') as MockThirdPartyProvider, \
-         patch('app.services.segmentation.segmentation_service.SegmentService') as MockSegmentService:
-        
-        mock_platform = MagicMock()
-        mock_platform.resolve.return_value = execution_plan
-        MockPlatformClient.return_value = mock_platform
-        
-        mock_provider = MagicMock()
-        mock_provider.process.side_effect = SegmentationProviderError(
-            "remove.bg API call failed: HTTP 401",
-            status_code=401
-        )
-        MockThirdPartyProvider.return_value = mock_provider
-        
-        # Mock rembg 成功
-        mock_rembg_service = MagicMock()
-        rembg_result = Image.new("RGBA", (800, 1200), color=(255, 0, 0, 255))
-        mock_rembg_service.segment_auto.return_value = (rembg_result, None)
-        MockSegmentService.return_value = mock_rembg_service
-        
-        service = SegmentationService()
-        cutout, notes = service.segment(
-            raw_image=sample_image,
-            template_code="tpl_001",
-            version_semver="0.1.0",
-            rules=rules,
+    mock 按真实类 autospec（spec_set），访问/设置不存在的属性或用错方法签名会直接报错。
+    """
+    with patch.multiple(
+        "app.services.segmentation.segmentation_service",
+        PlatformClient=DEFAULT,
+        ThirdPartySegmentationProvider=DEFAULT,
+        SegmentService=DEFAULT,
+        autospec=True,
+        spec_set=True,
+    ) as mocks:
+        mock_platform = mocks["PlatformClient"].return_value
+        mock_platform.resolve.return_value = EXECUTION_PLAN
+        yield (
+            mock_platform,
+            mocks["ThirdPartySegmentationProvider"].return_value,
+            mocks["SegmentService"].return_value,
         )
-        
-        # 验证结果（应该使用 rembg 的结果）
-        assert cutout is not None
-        assert cutout.mode == "RGBA"
-        
-        # 验证 notes
-        note_codes = [n["code"] for n in notes]
-        assert "SEG_THIRD_PARTY_FAIL" in note_codes
-        assert "seg.fallback" in note_codes
-        assert "seg.provider" in note_codes
-        
-        provider_note = next(n for n in notes if n["code"] == "seg.provider")
-        assert provider_note["details"]["provider"] == "rembg"
-        
-        fallback_note = next(n for n in notes if n["code"] == "seg.fallback")
-        assert fallback_note["details"]["fallback"] == "rembg"
 
 
-def test_segmentation_fallback_to_raw(sample_image, rules):
-    """测试 third-party 和 rembg 都失败，降级到 raw"""
-    # Mock platform resolve 成功
-    execution_plan = {
-        "providerCode": "removebg",
-        "endpoint": "https://api.remove.bg/v1.0/removebg",
-        "auth": {"apiKey": "test_key"},
-        "timeoutMs": 6000,
-        "params": {},
-    }
+def _segment(sample_image, rules):
+    """用 mock 依赖跑一次 SegmentationService.segment"""
+    service = SegmentationService()
+    return service.segment(
+        raw_image=sample_image,
+        template_code="tpl_001",
+        version_semver="0.1.0",
+        rules=rules,
+    )
+
+
+# (third-party 结果, rembg 结果, 期望 provider, 期望 fallback, 期望包含的 note codes)
+# third-party 结果："ok" 返回正常抠图 / "low_quality" 返回几乎全透明的图 / "error" 抛出 SegmentationProviderError
+# rembg 结果：None 不应被调用 / "ok" 成功 / "fail" 失败（返回原图 + 错误原因）
+SEGMENTATION_CASES = [
+    pytest.param("ok", None, "removebg", None, {"seg.provider"}, id="third_party_success"),
+    pytest.param(
+        "error", "ok", "rembg", "rembg",
+        {"SEG_THIRD_PARTY_FAIL", "seg.fallback", "seg.provider"},
+        id="fallback_to_rembg",
+    ),
+    pytest.param(
+        "error", "fail", "raw", "raw",
+        {"SEG_THIRD_PARTY_FAIL", "SEG_REMBG_FAIL", "seg.fallback", "seg.provider"},
+        id="fallback_to_raw",
+    ),
+    pytest.param(
+        "low_quality", "ok", "rembg", "rembg",
+        {"SEG_THIRD_PARTY_FAIL", "seg.fallback", "seg.provider"},
+        id="quality_check_fails",
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "third_party_result, rembg_result, expected_provider, expected_fallback, expected_codes",
+    SEGMENTATION_CASES,
+)
+def test_segmentation(
+    seg_mocks,
+    sample_image,
+    rgba_result_image,
+    low_quality_image,
+    rules,
+    third_party_result,
+    rembg_result,
+    expected_provider,
+    expected_fallback,
+    expected_codes,
+):
+    """测试 third-party 成功 / 失败降级到 rembg / 再降级到 raw / 质量检查失败降级"""
+    _, mock_provider, mock_rembg_service = seg_mocks
     
-    # Mock platform client 和 third-party provider
-    with patch('app.services.segmentation.segmentation_service.PlatformClient') as MockPlatformClient, \
-         patch('app.services.segmentation.segmentation_service.ThirdPartySegmentationProvider') as MockThirdPartyProvider, \
-         patch('app.services.segmentation.segmentation_service.SegmentService') as MockSegmentService:
-        
-        mock_platform = MagicMock()
-        mock_platform.resolve.return_value = execution_plan
-        MockPlatformClient.return_value = mock_platform
-        
-        mock_provider = MagicMock()
+    if third_party_result == "error":
         mock_provider.process.side_effect = SegmentationProviderError(
             "remove.bg API call failed: HTTP 401",
             status_code=401
         )
-        MockThirdPartyProvider.return_value = mock_provider
-        
-        # Mock rembg 也失败
-        mock_rembg_service = MagicMock()
+    elif third_party_result == "low_quality":
+        mock_provider.process.return_value = low_quality_image
+    else:
+        mock_provider.process.return_value = rgba_result_image
+    
+    if rembg_result == "ok":
+        rembg_image = Image.new("RGBA", (800, 1200), color=(255, 0, 0, 255))
+        mock_rembg_service.segment_auto.return_value = (rembg_image, None)
+    elif rembg_result == "fail":
         mock_rembg_service.segment_auto.return_value = (sample_image, "rembg_failed: test error")
-        MockSegmentService.return_value = mock_rembg_service
-        
-        service = SegmentationService()
-        cutout, notes = service.segment(
-            raw_image=sample_image,
-            template_code="tpl_001",
-            version_semver="0.1.0",
-            rules=rules,
-        )
-        
-        # 验证结果（应该返回原始图片）
-        assert cutout is not None
-        # 检查是否是同一个对象或相同尺寸
-        assert cutout.size == sample_image.size
-        
-        # 验证 notes
-        note_codes = [n["code"] for n in notes]
-        assert "SEG_THIRD_PARTY_FAIL" in note_codes
-        assert "SEG_REMBG_FAIL" in note_codes
-        assert "seg.fallback" in note_codes
-        assert "seg.provider" in note_codes
-        
-        provider_note = next(n for n in notes if n["code"] == "seg.provider")
-        assert provider_note["details"]["provider"] == "raw"
-        
-        fallback_note = next(n for n in notes if n["code"] == "seg.fallback")
-        assert fallback_note["details"]["fallback"] == "raw"
+    
+    cutout, notes = _segment(sample_image, rules)
+    
+    # 验证结果（raw 降级返回原图，其余为 RGBA 抠图）
+    assert cutout is not None
+    assert cutout.size == sample_image.size
+    if expected_provider != "raw":
+        assert cutout.mode == "RGBA"
+    
+    # 验证 notes（按 code 建一次索引，之后都是 O(1) 查找）
+    by_code = {n["code"]: n for n in notes}
+    assert expected_codes <= by_code.keys()
+    assert by_code["seg.provider"]["details"]["provider"] == expected_provider
+    
+    if expected_fallback is not None:
+        assert by_code["seg.fallback"]["details"]["fallback"] == expected_fallback
+    
+    if rembg_result is None:
+        mock_rembg_service.segment_auto.assert_not_called()
 
 
-def test_segmentation_quality_check_fails(sample_image, rules):
-    """测试质量检查失败，降级到 rembg"""
-    # 创建一个质量很差的图片（几乎全透明）
-    low_quality_image = Image.new("RGBA", (800, 1200), color=(0, 0, 0, 0))
-    # 只有很小的主体区域
-    pixels = low_quality_image.load()
-    for x in range(0, 10):
-        for y in range(0, 10):
-            pixels[x, y] = (255, 0, 0, 255)
+def test_injected_platform_client_is_shared(seg_mocks):
+    """测试注入的 PlatformClient 被直接使用，close() 不关闭共享 client；自建的 client 由 close() 关闭"""
+    mock_platform, _, _ = seg_mocks
+    shared_client = Mock(spec=PlatformClient)
     
-    # Mock platform resolve
-    execution_plan = {
-        "providerCode": "removebg",
-        "endpoint": "https://api.remove.bg/v1.0/removebg",
-        "auth": {"apiKey": "test_key"},
-        "timeoutMs": 6000,
-        "params": {},
-    }
+    service = SegmentationService(platform_client=shared_client)
+    service.close()
     
-    # Mock platform client 和 third-party provider
-    with patch('app.services.segmentation.segmentation_service.PlatformClient') as MockPlatformClient, \
-         patch('app.services.segmentation.segmentation_service.ThirdPartySegmentationProvider') as MockThirdPartyProvider, \
-         patch('app.services.segmentation.segmentation_service.SegmentService') as MockSegmentService:
-        
-        mock_platform = MagicMock()
-        mock_platform.resolve.return_value = execution_plan
-        MockPlatformClient.return_value = mock_platform
-        
-        mock_provider = MagicMock()
-        mock_provider.process.return_value = low_quality_image
-        MockThirdPartyProvider.return_value = mock_provider
-        
-        # Mock rembg 成功
-        mock_rembg_service = MagicMock()
-        rembg_result = Image.new("RGBA", (800, 1200), color=(255, 0, 0, 255))
-        mock_rembg_service.segment_auto.return_value = (rembg_result, None)
-        MockSegmentService.return_value = mock_rembg_service
-        
-        service = SegmentationService()
-        cutout, notes = service.segment(
-            raw_image=sample_image,
-            template_code="tpl_001",
-            version_semver="0.1.0",
-            rules=rules,
-        )
-        
-        # 验证结果（应该使用 rembg 的结果）
-        assert cutout is not None
-        assert cutout.mode == "RGBA"
-        
-        # 验证 notes 包含质量检查失败信息
-        note_codes = [n["code"] for n in notes]
-        assert "SEG_THIRD_PARTY_FAIL" in note_codes
-        assert "seg.fallback" in note_codes
+    assert service.platform_client is shared_client
+    shared_client.close.assert_not_called()
+    
+    owned = SegmentationService()
+    owned.close()
+    mock_platform.close.assert_called_once()
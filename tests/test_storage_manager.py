@@ -8,27 +8,65 @@
 4. 错误处理
 """
 
+import io
+import itertools
 import pytest
-import tempfile
+from datetime import datetime
 from pathlib import Path
 from PIL import Image
 from app.services.storage_manager import StorageManager, StorageError
 
 
-@pytest.fixture
-def temp_storage_dir():
-    """创建临时存储目录"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        yield tmpdir
+# 冻结的当前时间：所有按日期组织的文件都落在 20240101 目录下
+FROZEN_NOW = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class FrozenDatetime(datetime):
+    """now() 固定返回 FROZEN_NOW 的 datetime"""
+    
+    @classmethod
+    def now(cls, tz=None):
+        return FROZEN_NOW
+
+
+@pytest.fixture(scope="module", autouse=True)
+def frozen_datetime():
+    """整个模块内冻结 storage_manager 中的 datetime.now()"""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.services.storage_manager.datetime", FrozenDatetime)
+        yield
 
 
 @pytest.fixture
+def temp_storage_dir(tmp_path):
+    """临时存储目录（使用 pytest 的 tmp_path，由 pytest 统一清理）"""
+    return str(tmp_path)
+
+
+@pytest.fixture(scope="module")
 def sample_image():
-    """创建示例图像"""
+    """创建示例图像（模块内共享，测试中只读）"""
     img = Image.new("RGB", (100, 100), color=(255, 0, 0))  # 红色
     return img
 
 
+@pytest.fixture(scope="module")
+def tiny_jpeg_bytes(sample_image):
+    """sample_image 预编码的 JPEG 字节（模块内只编码一次）"""
+    buf = io.BytesIO()
+    sample_image.save(buf, format="JPEG", quality=50)
+    return buf.getvalue()
+
+
+@pytest.fixture
+def preencoded_jpeg_save(monkeypatch, tiny_jpeg_bytes):
+    """把 Image.save 替换为直接写入预编码的 JPEG 字节（只关心落盘路径的测试用，跳过重复编码）"""
+    def fake_save(self, fp, format=None, **params):
+        Path(fp).write_bytes(tiny_jpeg_bytes)
+    
+    monkeypatch.setattr(Image.Image, "save", fake_save)
+
+
 @pytest.fixture
 def sample_rgba_image():
     """创建示例 RGBA 图像"""
@@ -69,8 +107,7 @@ def test_storage_manager_store_image(temp_storage_dir, sample_image):
     # URL 格式: http://localhost:9002/files/v2/YYYYMMDD/filename.jpg
     # 需要检查存储目录中是否有文件
     storage_path = Path(temp_storage_dir)
-    date_dirs = [d for d in storage_path.iterdir() if d.is_dir()]
-    assert len(date_dirs) > 0  # 应该有日期目录
+    assert any(d.is_dir() for d in storage_path.iterdir())  # 应该有日期目录
 
 
 def test_storage_manager_store_with_auto_filename(temp_storage_dir, sample_image):
@@ -101,10 +138,9 @@ def test_storage_manager_store_rgba_image(temp_storage_dir, sample_rgba_image):
     assert url.startswith("http://localhost:9002")
     # 验证文件已保存（通过检查目录）
     storage_path = Path(temp_storage_dir)
-    date_dirs = [d for d in storage_path.iterdir() if d.is_dir()]
-    if date_dirs:
-        files = list(date_dirs[0].glob("*.jpg"))
-        assert len(files) > 0
+    date_dir = next((d for d in storage_path.iterdir() if d.is_dir()), None)
+    if date_dir is not None:
+        assert next(date_dir.glob("*.jpg"), None) is not None
 
 
 def test_storage_manager_get_url(temp_storage_dir):
@@ -149,10 +185,10 @@ def test_storage_manager_store_creates_date_directory(temp_storage_dir, sample_i
     
     # 检查是否有日期格式的目录（YYYYMMDD）
     storage_path = Path(temp_storage_dir)
-    date_dirs = [d for d in storage_path.iterdir() if d.is_dir() and d.name.isdigit()]
+    date_dir = next((d for d in storage_path.iterdir() if d.is_dir() and d.name.isdigit()), None)
     
-    assert len(date_dirs) > 0
-    assert len(date_dirs[0].name) == 8  # YYYYMMDD 格式
+    assert date_dir is not None
+    assert date_dir.name == FROZEN_NOW.strftime("%Y%m%d")  # YYYYMMDD 格式
 
 
 def test_storage_manager_store_without_extension(temp_storage_dir, sample_image):
@@ -185,11 +221,10 @@ def test_storage_manager_custom_subdirectory(temp_storage_dir, sample_image):
     assert url.startswith("http://localhost:9002")
     
     # 验证文件已保存
-    date_dirs = [d for d in custom_path.iterdir() if d.is_dir()]
-    assert len(date_dirs) > 0
+    assert any(d.is_dir() for d in custom_path.iterdir())
 
 
-def test_storage_manager_multiple_stores(temp_storage_dir, sample_image):
+def test_storage_manager_multiple_stores(temp_storage_dir, sample_image, preencoded_jpeg_save):
     """测试多次存储"""
     manager = StorageManager(storage_base_path=temp_storage_dir)
     
@@ -203,12 +238,8 @@ def test_storage_manager_multiple_stores(temp_storage_dir, sample_image):
     
     # 验证文件都已保存
     storage_path = Path(temp_storage_dir)
-    date_dirs = [d for d in storage_path.iterdir() if d.is_dir()]
-    if date_dirs:
-        all_files = []
-        for date_dir in date_dirs:
-            all_files.extend(list(date_dir.glob("*.jpg")))
-        assert len(all_files) >= 3
+    jpg_files = (f for d in storage_path.iterdir() if d.is_dir() for f in d.glob("*.jpg"))
+    assert sum(1 for _ in itertools.islice(jpg_files, 3)) == 3
 
 
 def test_store_final_creates_file_and_url(temp_storage_dir, sample_image):
@@ -8,10 +8,13 @@
 4. 缓存机制
 """
 
+import io
+import itertools
+import json
 import pytest
-import tempfile
 import zipfile
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from app.services.template_resolver import (
     TemplateResolver,
@@ -22,30 +25,51 @@ from app.services.template_resolver import (
 )
 
 
-@pytest.fixture
-def temp_cache_dir():
-    """创建临时缓存目录"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        yield tmpdir
+# 标准模板 zip 中的 manifest.json 内容
+CANONICAL_MANIFEST = {
+    "outputWidth": 1800,
+    "outputHeight": 1200,
+    "safeArea": {"x": 0.1, "y": 0.1, "w": 0.8, "h": 0.8},
+}
+
+# 会话级线程池的 worker 数（并发测试的 Barrier 参与数不能超过它）
+POOL_WORKERS = 16
 
 
 @pytest.fixture
-def sample_zip_file():
-    """创建示例 zip 文件（包含 manifest.json）"""
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zip_path = Path(tmpdir) / "test_template.zip"
-        
-        # 创建临时目录和 manifest.json
-        template_dir = Path(tmpdir) / "template"
-        template_dir.mkdir()
-        manifest_path = template_dir / "manifest.json"
-        manifest_path.write_text('{"outputWidth": 1800, "outputHeight": 1200}')
-        
-        # 创建 zip 文件
-        with zipfile.ZipFile(zip_path, "w") as zipf:
-            zipf.write(manifest_path, "manifest.json")
-        
-        yield zip_path
+def temp_cache_dir(tmp_path):
+    """临时缓存目录（使用 pytest 的 tmp_path，由 pytest 统一清理）"""
+    return str(tmp_path)
+
+
+@pytest.fixture(scope="session")
+def thread_pool():
+    """会话级线程池（并发测试共用，避免每个测试重复创建线程）"""
+    with ThreadPoolExecutor(max_workers=POOL_WORKERS) as executor:
+        yield executor
+
+
+@pytest.fixture(scope="session")
+def canonical_zip():
+    """
+    标准模板 zip（只含 manifest.json），整个会话只打包、只计算一次校验和
+    
+    返回 (zip_bytes, checksum)，测试中只读。
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zipf:
+        zipf.writestr("manifest.json", json.dumps(CANONICAL_MANIFEST))
+    zip_bytes = buf.getvalue()
+    return zip_bytes, hashlib.sha256(zip_bytes).hexdigest()
+
+
+@pytest.fixture(scope="session")
+def sample_zip_file(canonical_zip, tmp_path_factory):
+    """把标准模板 zip 写到磁盘（整个会话只写一次，测试中只读）"""
+    zip_bytes, _ = canonical_zip
+    zip_path = tmp_path_factory.mktemp("template_zip") / "test_template.zip"
+    zip_path.write_bytes(zip_bytes)
+    return zip_path
 
 
 def test_template_resolver_init(temp_cache_dir):
@@ -65,13 +89,10 @@ def test_template_resolver_init(temp_cache_dir):
     assert Path(temp_cache_dir).exists()
 
 
-def test_template_resolver_checksum_validation(sample_zip_file, temp_cache_dir):
+def test_template_resolver_checksum_validation(sample_zip_file, canonical_zip, temp_cache_dir):
     """测试校验和验证"""
-    # 计算正确的校验和
-    sha256_hash = hashlib.sha256()
-    with open(sample_zip_file, "rb") as f:
-        sha256_hash.update(f.read())
-    correct_checksum = sha256_hash.hexdigest()
+    # 正确的校验和（canonical_zip 会话内只计算一次）
+    _, correct_checksum = canonical_zip
     
     # 使用正确的校验和（应该通过）
     resolver = TemplateResolver(
@@ -82,26 +103,15 @@ def test_template_resolver_checksum_validation(sample_zip_file, temp_cache_dir):
         cache_dir=temp_cache_dir,
     )
     
-    # 使用错误的校验和（应该失败）
-    resolver_wrong = TemplateResolver(
-        template_code="tpl_001",
-        version="0.1.0",
-        download_url=f"file://{sample_zip_file}",
-        checksum="wrong_checksum",
-        cache_dir=temp_cache_dir,
-    )
+    # 校验和不匹配的下载流程见 test_checksum_mismatch
     
     # 注意：实际测试需要 HTTP 服务器，这里只测试结构
     assert resolver.checksum == correct_checksum
 
 
-def test_template_extraction(sample_zip_file, temp_cache_dir):
+def test_template_extraction(sample_zip_file, canonical_zip, temp_cache_dir):
     """测试模板解压功能"""
-    # 计算校验和
-    sha256_hash = hashlib.sha256()
-    with open(sample_zip_file, "rb") as f:
-        sha256_hash.update(f.read())
-    checksum = sha256_hash.hexdigest()
+    _, checksum = canonical_zip
     
     resolver = TemplateResolver(
         template_code="tpl_001",
@@ -124,8 +134,7 @@ def test_template_extraction(sample_zip_file, temp_cache_dir):
     assert manifest_path.exists()
     
     # 验证内容
-    content = manifest_path.read_text()
-    assert "outputWidth" in content
+    assert b"outputWidth" in manifest_path.read_bytes()
 
 
 def test_template_resolver_cache_dir_creation(temp_cache_dir):
@@ -143,78 +152,59 @@ def test_template_resolver_cache_dir_creation(temp_cache_dir):
     assert resolver.cache_dir == cache_subdir
 
 
-def test_template_resolver():
+def test_template_resolver(temp_cache_dir, canonical_zip):
     """
     测试 TemplateResolver 完整流程（符合用户要求的格式）
     
     使用 mock 模拟 HTTP 下载，确保模板被正确下载和解压
     """
-    import tempfile
     from unittest.mock import patch, Mock
     
-    with tempfile.TemporaryDirectory() as temp_cache_dir:
-        # 创建模拟的 zip 文件内容
-        import io
-        zip_content = io.BytesIO()
-        with zipfile.ZipFile(zip_content, "w") as zipf:
-            manifest_json = '{"outputWidth": 1800, "outputHeight": 1200, "safeArea": {"x": 0.1, "y": 0.1, "w": 0.8, "h": 0.8}}'
-            zipf.writestr("manifest.json", manifest_json)
-        zip_content.seek(0)
-        zip_bytes = zip_content.read()
-        
-        # 计算校验和
-        import hashlib
-        checksum = hashlib.sha256(zip_bytes).hexdigest()
-        
-        resolver = TemplateResolver(
-            template_code="tpl_001",
-            version="0.1.1",
-            download_url="http://127.0.0.1:9000/tpl_001_v0.1.1.zip",
-            checksum=checksum,
-            cache_dir=temp_cache_dir,
-        )
-        
-        # 验证初始化
-        assert resolver.template_code == "tpl_001"
-        assert resolver.version == "0.1.1"
-        assert resolver.download_url == "http://127.0.0.1:9000/tpl_001_v0.1.1.zip"
+    zip_bytes, checksum = canonical_zip
+    
+    resolver = TemplateResolver(
+        template_code="tpl_001",
+        version="0.1.1",
+        download_url="http://127.0.0.1:9000/tpl_001_v0.1.1.zip",
+        checksum=checksum,
+        cache_dir=temp_cache_dir,
+    )
+    
+    # 验证初始化
+    assert resolver.template_code == "tpl_001"
+    assert resolver.version == "0.1.1"
+    assert resolver.download_url == "http://127.0.0.1:9000/tpl_001_v0.1.1.zip"
+    
+    # Mock HTTP 请求
+    mock_response = Mock()
+    mock_response.status_code = 200
+    # 测试不关心流式分块，整个 zip 作为单个 chunk 返回
+    mock_response.iter_content = lambda chunk_size=None: iter((zip_bytes,))
+    mock_response.raise_for_status = Mock()
+    
+    with patch("app.services.template_resolver.requests.get", return_value=mock_response):
+        template_dir = resolver.resolve()
         
-        # Mock HTTP 请求
-        mock_response = Mock()
-        mock_response.status_code = 200
-        mock_response.iter_content = lambda chunk_size: [zip_bytes[i:i+chunk_size] for i in range(0, len(zip_bytes), chunk_size)]
-        mock_response.raise_for_status = Mock()
+        # 确保模板被正确下载和解压
+        assert template_dir is not None
+        assert Path(template_dir).exists()
+        assert (Path(template_dir) / "manifest.json").exists()
         
-        with patch("app.services.template_resolver.requests.get", return_value=mock_response):
-            template_dir = resolver.resolve()
-            
-            # 确保模板被正确下载和解压
-            assert template_dir is not None
-            assert Path(template_dir).exists()
-            assert (Path(template_dir) / "manifest.json").exists()
-            
-            # 验证 manifest.json 内容
-            manifest_path = Path(template_dir) / "manifest.json"
-            import json
-            manifest_data = json.loads(manifest_path.read_text())
-            assert manifest_data["outputWidth"] == 1800
-            assert manifest_data["outputHeight"] == 1200
-
-
-def test_template_resolver_with_real_http_server(temp_cache_dir, sample_zip_file):
+        # 验证 manifest.json 内容
+        manifest_path = Path(template_dir) / "manifest.json"
+        manifest_data = json.loads(manifest_path.read_text())
+        assert manifest_data["outputWidth"] == 1800
+        assert manifest_data["outputHeight"] == 1200
+
+
+def test_template_resolver_with_real_http_server(temp_cache_dir, sample_zip_file, canonical_zip):
     """
     测试 TemplateResolver 与真实 HTTP 服务器的集成（可选测试）
     
     需要先启动 HTTP 服务器：
     python -m http.server 9000 --directory <包含zip文件的目录>
     """
-    import hashlib
-    
-    # 计算校验和
-    sha256_hash = hashlib.sha256()
-    with open(sample_zip_file, "rb") as f:
-        sha256_hash.update(f.read())
-    correct_checksum = sha256_hash.hexdigest()
+    _, correct_checksum = canonical_zip
     
     resolver = TemplateResolver(
         template_code="tpl_001",
@@ -241,7 +231,6 @@ def test_template_resolver_with_real_http_server(temp_cache_dir, sample_zip_file
 
 def test_cache_hit(temp_cache_dir):
     """测试缓存命中"""
-    import json
     from unittest.mock import patch, Mock
     
     resolver = TemplateResolver(
@@ -270,20 +259,11 @@ def test_cache_hit(temp_cache_dir):
         assert Path(template_dir) / "manifest.json" == manifest_path
 
 
-def test_checksum_mismatch(temp_cache_dir):
+def test_checksum_mismatch(temp_cache_dir, canonical_zip):
     """测试校验和不匹配"""
-    import io
     from unittest.mock import patch, Mock
     
-    # 创建测试 zip 文件
-    zip_content = io.BytesIO()
-    with zipfile.ZipFile(zip_content, "w") as zipf:
-        zipf.writestr("manifest.json", '{"outputWidth": 1800}')
-    zip_content.seek(0)
-    zip_bytes = zip_content.read()
-    
-    # 计算实际校验和
-    actual_checksum = hashlib.sha256(zip_bytes).hexdigest()
+    zip_bytes, actual_checksum = canonical_zip
     wrong_checksum = "wrong_checksum_" + "0" * 48  # 错误的校验和
     
     resolver = TemplateResolver(
@@ -297,9 +277,7 @@ def test_checksum_mismatch(temp_cache_dir):
     # Mock HTTP 请求
     mock_response = Mock()
     mock_response.status_code = 200
-    mock_response.iter_content = lambda chunk_size: [
-        zip_bytes[i:i+chunk_size] for i in range(0, len(zip_bytes), chunk_size)
-    ]
+    mock_response.iter_content = lambda chunk_size=None: iter((zip_bytes,))
     mock_response.raise_for_status = Mock()
     
     with patch("app.services.template_resolver.requests.get", return_value=mock_response):
@@ -314,23 +292,17 @@ def test_checksum_mismatch(temp_cache_dir):
 
 def test_extract_contains_manifest_json(temp_cache_dir):
     """测试解压后包含 manifest.json"""
-    import io
-    import json
     from unittest.mock import patch, Mock
     
-    # 创建测试 zip 文件（包含 manifest.json）
+    # 创建测试 zip 文件（包含 manifest.json），记下写入的原始字节用于解压后比对
+    manifest_bytes = json.dumps(CANONICAL_MANIFEST).encode("utf-8")
     zip_content = io.BytesIO()
-    with zipfile.ZipFile(zip_content, "w") as zipf:
-        manifest_data = {
-            "outputWidth": 1800,
-            "outputHeight": 1200,
-            "safeArea": {"x": 0.1, "y": 0.1, "w": 0.8, "h": 0.8},
-        }
-        zipf.writestr("manifest.json", json.dumps(manifest_data))
+    with zipfile.ZipFile(zip_content, "w", compression=zipfile.ZIP_STORED) as zipf:
+        zipf.writestr("manifest.json", manifest_bytes)
         zipf.writestr("assets/bg.png", b"fake_image_data")
     
-    zip_content.seek(0)
-    zip_bytes = zip_content.read()
+    # getbuffer() 直接拿到内部缓冲区的 memoryview，哈希和下载 mock 都不再复制整个 zip
+    zip_bytes = zip_content.getbuffer()
     
     # 计算校验和
     checksum = hashlib.sha256(zip_bytes).hexdigest()
@@ -346,9 +318,7 @@ def test_extract_contains_manifest_json(temp_cache_dir):
     # Mock HTTP 请求
     mock_response = Mock()
     mock_response.status_code = 200
-    mock_response.iter_content = lambda chunk_size: [
-        zip_bytes[i:i+chunk_size] for i in range(0, len(zip_bytes), chunk_size)
-    ]
+    mock_response.iter_content = lambda chunk_size=None: iter((zip_bytes,))
     mock_response.raise_for_status = Mock()
     
     with patch("app.services.template_resolver.requests.get", return_value=mock_response):
@@ -361,45 +331,30 @@ def test_extract_contains_manifest_json(temp_cache_dir):
         manifest_path = Path(template_dir) / "manifest.json"
         assert manifest_path.exists(), "manifest.json 不存在"
         
-        # 验证 manifest.json 内容正确
-        manifest_data_loaded = json.loads(manifest_path.read_text())
-        assert manifest_data_loaded["outputWidth"] == 1800
-        assert manifest_data_loaded["outputHeight"] == 1200
+        # 验证 manifest.json 内容正确（与写入的字节完全一致）
+        assert manifest_path.read_bytes() == manifest_bytes
         
         # 验证其他文件也存在
         assets_dir = Path(template_dir) / "assets"
         assert assets_dir.exists() or (Path(template_dir) / "assets" / "bg.png").exists()
 
 
-def test_concurrent_resolve_only_download_once(temp_cache_dir):
+def test_concurrent_resolve_only_download_once(temp_cache_dir, canonical_zip, thread_pool):
     """测试并发 resolve 同一模板只会下载一次"""
-    import io
-    import json
     import threading
-    import requests
     from unittest.mock import patch, Mock
     
-    # 创建测试 zip 文件
-    zip_content = io.BytesIO()
-    with zipfile.ZipFile(zip_content, "w") as zipf:
-        zipf.writestr("manifest.json", '{"outputWidth": 1800}')
-    zip_content.seek(0)
-    zip_bytes = zip_content.read()
-    
-    # 计算校验和
-    checksum = hashlib.sha256(zip_bytes).hexdigest()
+    zip_bytes, checksum = canonical_zip
     
-    # 统计 requests.get 调用次数
-    download_count = {"count": 0}
+    # 统计 requests.get 调用次数（next() 在 CPython 中是原子的，多线程下不会少计）
+    call_counter = itertools.count(1)
     
     def counting_get(*args, **kwargs):
-        download_count["count"] += 1
+        next(call_counter)
         # 返回模拟响应
         mock_response = Mock()
         mock_response.status_code = 200
-        mock_response.iter_content = lambda chunk_size: [
-            zip_bytes[i:i+chunk_size] for i in range(0, len(zip_bytes), chunk_size)
-        ]
+        mock_response.iter_content = lambda chunk_size=None: iter((zip_bytes,))
         mock_response.raise_for_status = Mock()
         return mock_response
     
@@ -415,38 +370,27 @@ def test_concurrent_resolve_only_download_once(temp_cache_dir):
         for _ in range(10)
     ]
     
-    # 并发调用 resolve
-    results = []
-    errors = []
+    # 并发调用 resolve：patch 只应用一次，Barrier 让 10 个线程同时进入 resolve()，真正争用下载锁
+    barrier = threading.Barrier(len(resolvers))
     
     def resolve_template(resolver):
-        try:
-            with patch("app.services.template_resolver.requests.get", side_effect=counting_get):
-                result = resolver.resolve()
-                results.append(result)
-        except Exception as e:
-            errors.append(e)
-    
-    threads = [threading.Thread(target=resolve_template, args=(resolver,)) for resolver in resolvers]
+        barrier.wait(timeout=5)
+        return resolver.resolve()
     
-    # 启动所有线程
-    for thread in threads:
-        thread.start()
-    
-    # 等待所有线程完成
-    for thread in threads:
-        thread.join()
+    # 线程池的 worker 数必须不少于 Barrier 的参与数；万一不够，wait 超时抛 BrokenBarrierError 而不是一直挂起
+    assert len(resolvers) <= POOL_WORKERS
+    with patch("app.services.template_resolver.requests.get", side_effect=counting_get):
+        # 任一线程抛异常时 list() 会直接抛出
+        results = list(thread_pool.map(resolve_template, resolvers))
     
     # 验证：只下载了一次
-    assert download_count["count"] == 1, f"应该只下载一次，实际下载了 {download_count['count']} 次"
+    download_count = next(call_counter) - 1
+    assert download_count == 1, f"应该只下载一次，实际下载了 {download_count} 次"
     
     # 验证：所有线程都成功返回了相同的目录
     assert len(results) == 10, f"应该有 10 个结果，实际有 {len(results)} 个"
     assert len(set(results)) == 1, "所有结果应该是同一个目录"
     
-    # 验证：没有错误
-    assert len(errors) == 0, f"不应该有错误，实际有 {len(errors)} 个错误: {errors}"
-    
     # 验证：目录存在且包含 manifest.json
     template_dir = results[0]
     assert Path(template_dir).exists()
@@ -0,0 +1,21 @@
+"""
+测试请求模型的字段校验（纯 pydantic，不启动 FastAPI 应用）
+
+API 层的 422 校验见 test_validation_api.py。
+"""
+
+import pytest
+from pydantic import ValidationError
+from app.models.dtos import SafeArea
+
+
+def test_safe_area_ok():
+    """safeArea 在 [0,1] 范围内且 x+w、y+h 不越界"""
+    area = SafeArea(x=0.1, y=0.1, w=0.8, h=0.8)
+    assert (area.x, area.y, area.w, area.h) == (0.1, 0.1, 0.8, 0.8)
+
+
+def test_safe_area_out_of_bounds():
+    """x+w > 1 时校验失败"""
+    with pytest.raises(ValidationError):
+        SafeArea(x=0.9, y=0.9, w=0.5, h=0.5)